@@ -0,0 +1,117 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.posts = [Post.objects.create(author=self.author,
+                                          group=self.group,
+                                          text=f'Пост {num}')
+                      for num in range(3)]
+
+    def get(self, name, kwargs=None, **params):
+        return self.client.get(reverse(f'api:{name}', kwargs=kwargs), params)
+
+    def test_posts_feed(self):
+        """Лента отдаёт посты от новых к старым"""
+        response = self.get('posts')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        results = response.json()['results']
+        self.assertEqual([post['text'] for post in results],
+                         ['Пост 2', 'Пост 1', 'Пост 0'])
+        self.assertEqual(results[0]['author'], 'author')
+        self.assertEqual(results[0]['group'], 'group')
+
+    def test_fields_are_selected(self):
+        """?fields= оставляет в ответе только нужные поля"""
+        response = self.get('post', {'post_id': self.posts[0].id},
+                            fields='id,text')
+        self.assertEqual(response.json(),
+                         {'id': self.posts[0].id, 'text': 'Пост 0'})
+        response = self.get('posts', fields='id,password')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_feed_is_paginated_by_cursor(self):
+        """Следующая страница открывается по ссылке next"""
+        first = self.get('posts', limit=2).json()
+        self.assertIsNotNone(first['next'])
+        second = self.client.get(first['next']).json()
+        self.assertEqual([post['text'] for post in second['results']],
+                         ['Пост 0'])
+        self.assertIsNone(second['next'])
+        self.assertIsNotNone(second['previous'])
+        self.assertEqual(self.get('posts', limit=1000).status_code,
+                         HTTPStatus.BAD_REQUEST)
+
+    def test_feed_takes_few_queries(self):
+        """Страница ленты собирается одним запросом к базе"""
+        self.get('posts')
+        with self.assertNumQueries(1):
+            self.get('posts', fields='id,text,author')
+
+    def test_unchanged_response_is_not_modified(self):
+        """Повторный запрос с ETag получает 304, пока данные не изменились"""
+        response = self.get('group_posts', {'slug': 'group'})
+        self.assertIn('public', response['Cache-Control'])
+        etag = response['ETag']
+        response = self.client.get(
+            reverse('api:group_posts', kwargs={'slug': 'group'}),
+            HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        Post.objects.create(author=self.author, group=self.group,
+                            text='Новый пост')
+        response = self.client.get(
+            reverse('api:group_posts', kwargs={'slug': 'group'}),
+            HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_profile_group_and_comments(self):
+        """Профиль, группа и комментарии отдаются по своим адресам"""
+        Comment.objects.create(post=self.posts[0], author=self.author,
+                               text='Комментарий')
+        profile = self.get('profile', {'username': 'author'}).json()
+        self.assertEqual(profile['posts_count'], 3)
+        group = self.get('group', {'slug': 'group'}).json()
+        self.assertEqual(group['title'], 'Группа')
+        comments = self.get('comments', {'post_id': self.posts[0].id})
+        self.assertEqual([comment['text']
+                          for comment in comments.json()['results']],
+                         ['Комментарий'])
+
+    @override_settings(API_CACHE_MAX_AGE=0)
+    def test_missing_objects(self):
+        """Несуществующие объекты дают 404 в JSON"""
+        for name, kwargs in (('post', {'post_id': 0}),
+                             ('comments', {'post_id': 0}),
+                             ('group_posts', {'slug': 'missing'}),
+                             ('profile', {'username': 'missing'})):
+            with self.subTest(name=name):
+                response = self.get(name, kwargs)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+                self.assertIn('detail', response.json())
+
+    def test_errors_are_not_cached_publicly(self):
+        """Ошибки не кэшируются и кодируются так же, как данные"""
+        response = self.get('post', {'post_id': 0})
+        self.assertNotIn('Cache-Control', response)
+        self.assertIn('Не найдено'.encode(), response.content)
+        response = self.get('posts', fields='nope')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertNotIn('Cache-Control', response)
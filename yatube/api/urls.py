@@ -0,0 +1,28 @@
+# api/urls.py
+
+"""
+ Адреса JSON API только для чтения. Номер версии входит в адрес,
+ чтобы несовместимые изменения выходили под новым префиксом.
+"""
+
+from django.urls import path
+
+from . import views
+
+app_name = 'api'
+
+urlpatterns = [
+    path('v1/posts/', views.posts, name='posts'),
+    path('v1/posts/<int:post_id>/', views.post, name='post'),
+    path('v1/posts/<int:post_id>/comments/',
+         views.comments,
+         name='comments'),
+    path('v1/groups/<slug:slug>/', views.group, name='group'),
+    path('v1/groups/<slug:slug>/posts/',
+         views.group_posts,
+         name='group_posts'),
+    path('v1/profiles/<str:username>/', views.profile, name='profile'),
+    path('v1/profiles/<str:username>/posts/',
+         views.profile_posts,
+         name='profile_posts'),
+]
@@ -0,0 +1,229 @@
+"""
+ JSON API только для чтения: посты, группы, профили и комментарии.
+
+ Ответы собираются прямо из .values(), без создания объектов моделей и
+ без шаблонов, листаются курсорами и проверяются по ETag.
+"""
+
+from functools import wraps
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import require_GET
+
+from core.cache import conditional_page, get_version, page_validators
+from core.paginator import CursorPaginator
+from posts import versions
+from posts.models import Comment, Group, Post, User
+from posts.utils import post_validators
+
+# Поля ответа и пути, по которым они читаются через .values()
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comments_count': 'comments_count',
+}
+# Комментарии не меняют версии лент, поэтому в лентах нет их числа
+FEED_FIELDS = {name: path for name, path in POST_FIELDS.items()
+               if name != 'comments_count'}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'created': 'created',
+    'author': 'author__username',
+}
+GROUP_FIELDS = {
+    'slug': 'slug',
+    'title': 'title',
+    'description': 'description',
+}
+PROFILE_FIELDS = {
+    'username': 'username',
+    'first_name': 'first_name',
+    'last_name': 'last_name',
+    'posts_count': 'stats__posts_count',
+    'followers_count': 'stats__followers_count',
+    'following_count': 'stats__following_count',
+}
+
+
+class ApiError(Exception):
+    def __init__(self, detail, status=400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status = status
+
+
+def json_response(data, status=200):
+    """Ответ API: данные и ошибки кодируются одинаково, кириллица как есть."""
+    return JsonResponse(data, status=status,
+                        json_dumps_params={'ensure_ascii': False})
+
+
+def scope_validators(scope):
+    """Проверка ответа по версии области кэша scope(**kwargs)."""
+    def validators(request, **kwargs):
+        return page_validators(request, [get_version(scope(**kwargs))],
+                               cookies=False)
+    return validators
+
+
+def post_api_validators(request, post_id):
+    return post_validators(request, post_id, cookies=False)
+
+
+def api_view(validators):
+    """Отдаёт словарь из представления как JSON с заголовками кэша.
+
+    Успешный ответ одинаков для всех пользователей, поэтому его можно
+    хранить в общих кэшах settings.API_CACHE_MAX_AGE секунд, а потом
+    перепроверять по ETag.
+    """
+    def decorator(view):
+        @conditional_page(validators, cookies=False)
+        def render(request, **kwargs):
+            try:
+                data = view(request, **kwargs)
+            except ApiError as error:
+                return json_response({'detail': error.detail},
+                                     status=error.status)
+            return json_response(data)
+
+        @require_GET
+        @wraps(view)
+        def wrapper(request, **kwargs):
+            response = render(request, **kwargs)
+            # Ошибки не должны оседать в общих кэшах
+            if response.status_code == 200:
+                patch_cache_control(response, public=True,
+                                    max_age=settings.API_CACHE_MAX_AGE)
+            return response
+        return wrapper
+    return decorator
+
+
+def selected_fields(request, available):
+    """Поля из ?fields=a,b или все доступные."""
+    names = request.GET.get('fields')
+    if not names:
+        return available
+    names = names.split(',')
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ApiError(f'Неизвестные поля: {", ".join(unknown)}')
+    return {name: available[name] for name in names}
+
+
+def serialize(row, fields):
+    data = {name: row[path] for name, path in fields.items()}
+    if data.get('image') is not None:
+        storage = Post._meta.get_field('image').storage
+        data['image'] = storage.url(data['image']) if data['image'] else None
+    return data
+
+
+def page_size(request):
+    try:
+        size = int(request.GET.get('limit', settings.API_PAGE_SIZE))
+    except ValueError:
+        raise ApiError('limit должен быть числом')
+    if not 1 <= size <= settings.API_MAX_PAGE_SIZE:
+        raise ApiError(f'limit должен быть от 1 до '
+                       f'{settings.API_MAX_PAGE_SIZE}')
+    return size
+
+
+def page_url(request, **cursor):
+    query = request.GET.copy()
+    for name in ('after', 'before'):
+        query.pop(name, None)
+    query.update(cursor)
+    return request.build_absolute_uri(f'?{query.urlencode()}')
+
+
+def cursor_page(request, queryset, fields, field='pub_date',
+                ascending=False):
+    """Страница записей queryset со ссылками на соседние страницы."""
+    paths = {field, 'id', *fields.values()}
+    paginator = CursorPaginator(queryset.values(*paths), page_size(request),
+                                field=field, ascending=ascending)
+    page_obj = paginator.get_page(after=request.GET.get('after'),
+                                  before=request.GET.get('before'))
+    return {
+        'results': [serialize(row, fields) for row in page_obj],
+        'next': (page_url(request, after=page_obj.next_cursor)
+                 if page_obj.has_next() else None),
+        'previous': (page_url(request, before=page_obj.previous_cursor)
+                     if page_obj.has_previous() else None),
+    }
+
+
+def get_id(queryset, **lookup):
+    """id записи или 404, чтобы дальше фильтровать по индексу."""
+    pk = queryset.filter(**lookup).values_list('id', flat=True).first()
+    if pk is None:
+        raise ApiError('Не найдено', status=404)
+    return pk
+
+
+def get_row(queryset, fields):
+    row = queryset.values(*fields.values()).first()
+    if row is None:
+        raise ApiError('Не найдено', status=404)
+    return serialize(row, fields)
+
+
+@api_view(scope_validators(versions.index_scope))
+def posts(request):
+    return cursor_page(request, Post.objects.all(),
+                       selected_fields(request, FEED_FIELDS))
+
+
+@api_view(post_api_validators)
+def post(request, post_id):
+    return get_row(Post.objects.filter(pk=post_id),
+                   selected_fields(request, POST_FIELDS))
+
+
+@api_view(post_api_validators)
+def comments(request, post_id):
+    data = cursor_page(request, Comment.objects.filter(post_id=post_id),
+                       selected_fields(request, COMMENT_FIELDS),
+                       field='created', ascending=True)
+    if not data['results']:
+        get_id(Post.objects, pk=post_id)
+    return data
+
+
+@api_view(scope_validators(versions.group_scope))
+def group(request, slug):
+    return get_row(Group.objects.filter(slug=slug),
+                   selected_fields(request, GROUP_FIELDS))
+
+
+@api_view(scope_validators(versions.group_scope))
+def group_posts(request, slug):
+    group_id = get_id(Group.objects, slug=slug)
+    return cursor_page(request, Post.objects.filter(group_id=group_id),
+                       selected_fields(request, FEED_FIELDS))
+
+
+@api_view(scope_validators(versions.profile_scope))
+def profile(request, username):
+    data = get_row(User.objects.filter(username=username),
+                   selected_fields(request, PROFILE_FIELDS))
+    # У пользователя без записи AuthorStats счётчики нулевые
+    return {name: 0 if value is None and name.endswith('_count') else value
+            for name, value in data.items()}
+
+
+@api_view(scope_validators(versions.profile_scope))
+def profile_posts(request, username):
+    author_id = get_id(User.objects, username=username)
+    return cursor_page(request, Post.objects.filter(author_id=author_id),
+                       selected_fields(request, FEED_FIELDS))
@@ -0,0 +1,252 @@
+import hashlib
+from functools import wraps
+from time import sleep, time
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import (_generate_cache_header_key, get_cache_key,
+                                get_conditional_response, learn_cache_key,
+                                patch_vary_headers)
+from django.utils.http import http_date, quote_etag
+
+
+def _version_key(scope):
+    return f'version:{scope}'
+
+
+def _new_version():
+    # Время создания в начале версии нужно для заголовка Last-Modified
+    return f'{int(time())}-{uuid4().hex}'
+
+
+def version_time(version):
+    """Когда была создана версия, в секундах, или None, если неизвестно."""
+    try:
+        return int(version.split('-')[0])
+    except (AttributeError, ValueError):
+        return None
+
+
+def get_version(scope):
+    """Возвращает текущую версию области кэша, например ленты группы."""
+    key = _version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def get_versions(scopes):
+    """Возвращает версии нескольких областей кэша одним запросом."""
+    keys = {scope: _version_key(scope) for scope in scopes}
+    found = cache.get_many(keys.values())
+    return {scope: found.get(key) or get_version(scope)
+            for scope, key in keys.items()}
+
+
+def bump_version(*scopes):
+    """Делает устаревшими все страницы, закэшированные в этих областях."""
+    cache.set_many({_version_key(scope): _new_version() for scope in scopes},
+                   None)
+
+
+def acquire_lock(key, timeout):
+    """Берёт блокировку на ключ через атомарный cache.add."""
+    token = uuid4().hex
+    if cache.add(f'{key}.lock', token, timeout):
+        return token
+    return None
+
+
+def release_lock(key, token):
+    if cache.get(f'{key}.lock') == token:
+        cache.delete(f'{key}.lock')
+
+
+def page_validators(request, versions, modified=None, *parts,
+                    cookies=True):
+    """ETag и Last-Modified страницы по версиям данных, из которых она
+    собрана, и дополнительным частям parts.
+
+    Страницы зависят от пользователя, поэтому в ETag входят куки - так
+    же, как в ключ кэша страниц с Vary: Cookie. Общим для всех ответам
+    куки не нужны: cookies=False.
+    """
+    raw = '|'.join([*versions, *map(str, parts),
+                    request.META.get('HTTP_COOKIE', '') if cookies else ''])
+    etag = quote_etag(hashlib.md5(raw.encode()).hexdigest())
+    times = [version_time(version) for version in versions]
+    if modified is not None:
+        times.append(modified)
+    last_modified = max(times) if times and None not in times else None
+    return etag, last_modified
+
+
+def set_validators(response, etag, last_modified):
+    if response.status_code != 200:
+        return
+    response.setdefault('ETag', etag)
+    if last_modified is not None:
+        response.setdefault('Last-Modified', http_date(last_modified))
+
+
+def _not_modified(request, validators, cookies=True):
+    """Ответ 304 Not Modified, если у клиента актуальная копия, иначе None."""
+    if validators is None:
+        return None
+    response = get_conditional_response(request, *validators)
+    if response is not None and cookies:
+        patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+def conditional_page(validators, cookies=True):
+    """Отвечает 304 Not Modified, не вызывая представление.
+
+    validators(request, **kwargs) возвращает пару (ETag, Last-Modified)
+    или None, если проверять нечего. cookies=False - для ответов, не
+    зависящих от пользователя.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            found = validators(request, **kwargs)
+            not_modified = _not_modified(request, found, cookies)
+            if not_modified is not None:
+                return not_modified
+            response = view(request, *args, **kwargs)
+            if found is not None:
+                set_validators(response, *found)
+            return response
+        return wrapper
+    return decorator
+
+
+def _store_page(request, response, key_prefix, version, timeout,
+                stale_timeout, validators, cookies=True):
+    if response.status_code != 200 or response.streaming:
+        return
+    if validators is not None:
+        # Устаревшая копия из кэша будет отдаваться со своим ETag
+        set_validators(response, *validators)
+    if cookies:
+        # Страницы зависят от пользователя, а SessionMiddleware
+        # добавит Vary: Cookie уже после декоратора
+        patch_vary_headers(response, ('Cookie',))
+    cache_key = learn_cache_key(request, response, timeout + stale_timeout,
+                                key_prefix, cache=cache)
+    entry = {'version': version,
+             'fresh_until': time() + timeout,
+             'response': response}
+    cache.set(cache_key, entry, timeout + stale_timeout)
+
+
+def _wait_for_entry(lock_key, get_cache_key):
+    """Ждёт страницу, которую строит держатель блокировки lock_key.
+
+    get_cache_key() возвращает ключ страницы или None, пока он не
+    известен. Если блокировку отпустили, а страницы для этого запроса
+    нет (например, у него другие куки), ждать дальше нечего.
+    """
+    deadline = time() + settings.CACHE_LOCK_WAIT
+    while time() < deadline:
+        sleep(0.05)
+        cache_key = get_cache_key()
+        entry = cache.get(cache_key) if cache_key is not None else None
+        if entry is not None:
+            return entry
+        if cache.get(f'{lock_key}.lock') is None:
+            return None
+    return None
+
+
+def _is_fresh(entry, version):
+    return (entry is not None and entry['version'] == version
+            and entry['fresh_until'] > time())
+
+
+def _serve_cached(cache_key, version, build):
+    """Свежая страница из кэша, устаревшая - пока её обновляет другой
+    запрос, иначе новая страница, построенная под блокировкой."""
+    entry = cache.get(cache_key)
+    if _is_fresh(entry, version):
+        return entry['response']
+    token = acquire_lock(cache_key, settings.CACHE_LOCK_TIMEOUT)
+    if token is None:
+        entry = entry or _wait_for_entry(cache_key, lambda: cache_key)
+        return entry['response'] if entry else build()
+    try:
+        return build()
+    finally:
+        release_lock(cache_key, token)
+
+
+def _serve_first(request, key_prefix, build):
+    """Страница, для адреса которой в кэше ещё нет заголовков.
+
+    Ключ страницы узнаётся только после её построения, поэтому
+    блокировка берётся по ключу заголовков адреса, а остальные запросы
+    ждут, пока он появится.
+    """
+    lock_key = _generate_cache_header_key(key_prefix, request)
+    token = acquire_lock(lock_key, settings.CACHE_LOCK_TIMEOUT)
+    if token is None:
+        entry = _wait_for_entry(lock_key, lambda: get_cache_key(
+            request, key_prefix, 'GET', cache=cache))
+        return entry['response'] if entry else build()
+    try:
+        return build()
+    finally:
+        release_lock(lock_key, token)
+
+
+def cache_page_swr(timeout, key_prefix, scope=None, stale_timeout=None,
+                   cookies=True):
+    """Аналог cache_page, отдающий устаревшую страницу, пока её обновляют.
+
+    Страница свежая timeout секунд и пока не изменилась версия области
+    scope (scope получает именованные аргументы представления). После
+    этого ещё stale_timeout секунд её отдают всем запросам, кроме
+    одного, который под блокировкой строит новую версию. Если страницы
+    в кэше нет совсем, запросы ждут того, кто взял блокировку, не дольше
+    settings.CACHE_LOCK_WAIT секунд.
+
+    Страницы с областью получают ETag и Last-Modified по её версии, и
+    повторный запрос с ними получает 304 Not Modified без обращения к
+    кэшу страниц и к базе. cookies=False - для страниц, одинаковых для
+    всех пользователей: их копия в кэше и ETag не зависят от куки.
+    """
+    if stale_timeout is None:
+        stale_timeout = settings.CACHE_STALE_TIMEOUT
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+
+            def build():
+                response = view(request, *args, **kwargs)
+                _store_page(request, response, key_prefix, version,
+                            timeout, stale_timeout, validators, cookies)
+                return response
+
+            version = get_version(scope(**kwargs)) if scope else None
+            validators = None
+            if version is not None:
+                validators = page_validators(request, [version],
+                                             cookies=cookies)
+            not_modified = _not_modified(request, validators, cookies)
+            if not_modified is not None:
+                return not_modified
+            cache_key = get_cache_key(request, key_prefix, 'GET',
+                                      cache=cache)
+            if cache_key is None:
+                return _serve_first(request, key_prefix, build)
+            return _serve_cached(cache_key, version, build)
+        return wrapper
+    return decorator
@@ -0,0 +1,162 @@
+from django.core.paginator import Page, Paginator
+from django.db.models import Max, Q
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_bytes, force_str
+from django.utils.functional import cached_property
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+
+class ElidedPaginator(Paginator):
+    """Paginator с get_elided_page_range из Django 3.2.
+
+    Вместо всех номеров страниц выдаёт первые и последние on_ends
+    страниц и по on_each_side страниц вокруг текущей, пропуски
+    отмечаются ELLIPSIS. Длина списка не зависит от числа страниц.
+    """
+    ELLIPSIS = '…'
+
+    def get_elided_page_range(self, number=1, *, on_each_side=3, on_ends=2):
+        number = self.validate_number(number)
+        if self.num_pages <= (on_each_side + on_ends) * 2:
+            yield from self.page_range
+            return
+        if number > 1 + on_each_side + on_ends + 1:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < self.num_pages - on_each_side - on_ends - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(self.num_pages - on_ends + 1,
+                             self.num_pages + 1)
+        else:
+            yield from range(number + 1, self.num_pages + 1)
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator, не считающий COUNT(*) по всей таблице.
+
+    Для запроса без фильтров число строк оценивается сверху по
+    наибольшему первичному ключу - это один шаг по индексу. Запросы с
+    фильтрами считаются точно.
+
+    После удалений, в том числе массовых из админки, оценка больше
+    настоящего числа строк на число удалённых, и последние страницы
+    списка могут оказаться пустыми. Для списка в админке это приемлемая
+    цена за то, что страница не считает всю таблицу.
+    """
+
+    @cached_property
+    def count(self):
+        if self.object_list.query.where:
+            return super().count
+        estimate = self.object_list.aggregate(estimate=Max('pk'))
+        return estimate['estimate'] or 0
+
+
+class CursorPage(Page):
+    """Страница ленты, соседние страницы которой адресуются курсорами."""
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        super().__init__(object_list, None, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<Cursor page>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class CursorPaginator(Paginator):
+    """Постраничный вывод по ключу (field, tiebreaker) без COUNT(*) и OFFSET.
+
+    По умолчанию записи упорядочены от новых к старым, с ascending=True -
+    от старых к новым. Курсор ``after`` ведёт к следующим записям,
+    ``before`` - к предыдущим.
+    """
+
+    def __init__(self, object_list, per_page, field='pub_date',
+                 tiebreaker='id', ascending=False):
+        self.field = field
+        self.tiebreaker = tiebreaker
+        self.ascending = ascending
+        ordering = (field, tiebreaker)
+        self.reversed_ordering = tuple(f'-{name}' for name in ordering)
+        if not ascending:
+            ordering, self.reversed_ordering = (self.reversed_ordering,
+                                                ordering)
+        super().__init__(object_list.order_by(*ordering), per_page)
+
+    def encode_cursor(self, obj):
+        # Строки из .values() приходят словарями
+        get = obj.get if isinstance(obj, dict) else obj.__getattribute__
+        value = get(self.field).isoformat()
+        pk = get(self.tiebreaker)
+        return urlsafe_base64_encode(force_bytes(f'{value}|{pk}'))
+
+    def decode_cursor(self, cursor):
+        """Возвращает пару (значение поля, id) или None для плохого курсора."""
+        if not cursor:
+            return None
+        try:
+            value, pk = force_str(urlsafe_base64_decode(cursor)).split('|')
+            value = parse_datetime(value)
+            pk = int(pk)
+        except (TypeError, ValueError):
+            return None
+        if value is None:
+            return None
+        return value, pk
+
+    def _beyond(self, key, lookup):
+        value, pk = key
+        return (Q(**{f'{self.field}__{lookup}': value})
+                | Q(**{self.field: value, f'{self.tiebreaker}__{lookup}': pk}))
+
+    def _following(self, key):
+        return self._beyond(key, 'gt' if self.ascending else 'lt')
+
+    def _preceding(self, key):
+        return self._beyond(key, 'lt' if self.ascending else 'gt')
+
+    def get_page(self, after=None, before=None):
+        """Возвращает страницу после курсора ``after`` или перед ``before``.
+
+        Непрочитанный курсор ведёт на первую страницу, как и неверный
+        номер страницы у обычного Paginator.
+        """
+        limit = self.per_page + 1
+        after_key = self.decode_cursor(after)
+        before_key = None if after_key else self.decode_cursor(before)
+        if before_key:
+            rows = list(self.object_list.filter(
+                self._preceding(before_key)
+            ).order_by(*self.reversed_ordering)[:limit])
+            if rows:
+                has_previous = len(rows) > self.per_page
+                return self._page(rows[:self.per_page][::-1],
+                                  has_next=True,
+                                  has_previous=has_previous)
+        queryset = self.object_list
+        if after_key:
+            queryset = queryset.filter(self._following(after_key))
+        rows = list(queryset[:limit])
+        return self._page(rows[:self.per_page],
+                          has_next=len(rows) > self.per_page,
+                          has_previous=after_key is not None)
+
+    def _page(self, rows, has_next, has_previous):
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = self.encode_cursor(rows[-1])
+        if rows and has_previous:
+            previous_cursor = self.encode_cursor(rows[0])
+        return CursorPage(rows, self, next_cursor, previous_cursor)
@@ -0,0 +1,56 @@
+import hashlib
+import os
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+# Имя файла в раскладке ContentAddressedStorage: <папка>/ab/cd/<sha256>.ext
+SHARDED_NAME = re.compile(
+    r'(^|/)(?P<a>[0-9a-f]{2})/(?P<b>[0-9a-f]{2})/(?P=a)(?P=b)[0-9a-f]{60}\.')
+
+
+def content_hash(content):
+    """sha256 содержимого файла, прочитанного по частям."""
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def is_hashed_name(name):
+    """Лежит ли файл уже в раскладке по хэшу содержимого."""
+    return bool(SHARDED_NAME.search(name))
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, называющее файлы по sha256 их содержимого.
+
+    Файлы раскладываются по вложенным папкам из первых символов хэша,
+    чтобы в одной папке не оказывались миллионы файлов. Повторная
+    загрузка того же содержимого не создаёт копию, а возвращает имя уже
+    сохранённого файла.
+    """
+
+    def hashed_name(self, name, content):
+        digest = content_hash(content)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(os.path.dirname(name), digest[:2], digest[2:4],
+                            f'{digest}{extension}')
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            try:
+                # Файл снова нужен: сборщик мусора не трогает свежие файлы
+                os.utime(self.path(name))
+                return name
+            except FileNotFoundError:
+                pass
+        return self._save(name, content)
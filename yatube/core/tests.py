@@ -0,0 +1,99 @@
+from threading import Event, Thread
+from time import sleep
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils.cache import get_cache_key
+
+from .cache import acquire_lock, bump_version, cache_page_swr
+from .paginator import ElidedPaginator
+
+
+@override_settings(CACHE_LOCK_WAIT=0)
+class CachePageSWRTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+        @cache_page_swr(60, 'test_page', lambda: 'test')
+        def view(request):
+            self.calls += 1
+            return HttpResponse(f'Ответ {self.calls}')
+
+        self.view = view
+        self.factory = RequestFactory()
+
+    def get(self):
+        return self.view(self.factory.get('/page/')).content.decode()
+
+    def test_fresh_page_is_served_from_cache(self):
+        """Свежая страница берётся из кэша"""
+        self.assertEqual(self.get(), 'Ответ 1')
+        self.assertEqual(self.get(), 'Ответ 1')
+        self.assertEqual(self.calls, 1)
+
+    def test_stale_page_is_served_while_locked(self):
+        """Пока страницу обновляют, остальным отдаётся устаревшая"""
+        self.get()
+        bump_version('test')
+        cache_key = get_cache_key(self.factory.get('/page/'), 'test_page',
+                                  'GET', cache=cache)
+        self.assertIsNotNone(acquire_lock(cache_key, 60))
+        self.assertEqual(self.get(), 'Ответ 1')
+        self.assertEqual(self.calls, 1)
+
+    def test_stale_page_is_refreshed_by_lock_holder(self):
+        """Устаревшую страницу обновляет тот, кто взял блокировку"""
+        self.get()
+        bump_version('test')
+        self.assertEqual(self.get(), 'Ответ 2')
+        self.assertEqual(self.get(), 'Ответ 2')
+
+    @override_settings(CACHE_LOCK_WAIT=5)
+    def test_cold_page_is_built_once(self):
+        """Страницу, которой нет в кэше, строит один запрос, другие ждут"""
+        started, release = Event(), Event()
+
+        @cache_page_swr(60, 'cold_page')
+        def view(request):
+            self.calls += 1
+            started.set()
+            release.wait(5)
+            return HttpResponse(f'Ответ {self.calls}')
+
+        responses = []
+
+        def get():
+            responses.append(view(self.factory.get('/cold/')).content)
+
+        threads = [Thread(target=get), Thread(target=get)]
+        threads[0].start()
+        started.wait(5)
+        threads[1].start()
+        sleep(0.2)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(responses, ['Ответ 1'.encode()] * 2)
+
+
+class ElidedPaginatorTests(TestCase):
+    def test_short_range_is_not_elided(self):
+        """Немного страниц выводятся все"""
+        paginator = ElidedPaginator(range(50), 10)
+        self.assertEqual(list(paginator.get_elided_page_range(3)),
+                         [1, 2, 3, 4, 5])
+
+    def test_long_range_is_elided(self):
+        """Из тысяч страниц выводятся края и окно вокруг текущей"""
+        paginator = ElidedPaginator(range(50000), 1)
+        ellipsis = ElidedPaginator.ELLIPSIS
+        self.assertEqual(
+            list(paginator.get_elided_page_range(100)),
+            [1, 2, ellipsis, 97, 98, 99, 100, 101, 102, 103, ellipsis,
+             49999, 50000])
+        self.assertEqual(
+            list(paginator.get_elided_page_range(1)),
+            [1, 2, 3, 4, ellipsis, 49999, 50000])
@@ -0,0 +1,114 @@
+"""
+ Массовые операции над постами: по одному INSERT, UPDATE или DELETE на
+ пачку или таблицу.
+
+ Сигналы Post при этом не отправляются, поэтому кэш лент, счётчики
+ авторов, индекс поиска и ленты подписок обновляются здесь же.
+"""
+
+from django.db import connections, transaction
+from django.db.models import Count
+
+from core.cache import bump_version
+
+from . import search, timeline, versions
+from .counters import bump_author
+from .models import Comment, Group, Post, Timeline, User
+
+
+def _bump_feeds(post_ids, user_ids):
+    """Сбрасывает ленты и карточки постов из подзапроса post_ids."""
+    slugs = Group.objects.filter(posts__in=post_ids).values_list(
+        'slug', flat=True).distinct()
+    users = User.objects.filter(id__in=user_ids).values_list(
+        'id', 'username')
+    bump_version(versions.INDEX,
+                 *(versions.group_scope(slug) for slug in slugs),
+                 *(scope for user_id, username in users
+                   for scope in (versions.user_scope(user_id),
+                                 versions.profile_scope(username))))
+
+
+def move_to_group(queryset, group):
+    """Переносит посты в группу group (или убирает из групп) одним UPDATE.
+
+    Карточки постов сбрасываются через версии их авторов, чтобы не
+    перебирать посты по одному.
+    """
+    posts = queryset.order_by()
+    post_ids = posts.values('pk')
+    with transaction.atomic():
+        user_ids = list(posts.values_list('author', flat=True).distinct())
+        _bump_feeds(post_ids, user_ids)
+        moved = posts.update(group=group)
+    if group is not None:
+        bump_version(versions.group_scope(group.slug))
+    return moved
+
+
+def delete_posts(queryset):
+    """Удаляет посты, их комментарии и записи лент подписок.
+
+    На каждую таблицу уходит один DELETE с подзапросом вместо загрузки
+    всех объектов, как в стандартном действии админки.
+    """
+    posts = queryset.order_by()
+    post_ids = posts.values('pk')
+    sql, params = post_ids.query.sql_with_params()
+    tables = [(Comment._meta.db_table, 'post_id'),
+              (Timeline._meta.db_table, 'post_id')]
+    if connections[posts.db].vendor == 'sqlite':
+        tables.append((search.FTS_TABLE, 'rowid'))
+    with transaction.atomic(using=posts.db):
+        counts = list(posts.values_list('author').annotate(
+            count=Count('pk')))
+        _bump_feeds(post_ids, [user_id for user_id, count in counts])
+        with connections[posts.db].cursor() as cursor:
+            for table, column in tables:
+                cursor.execute(f'DELETE FROM {table} '
+                               f'WHERE {column} IN ({sql})', params)
+            cursor.execute(f'DELETE FROM {Post._meta.db_table} '
+                           f'WHERE id IN ({sql})', params)
+            deleted = cursor.rowcount
+        for user_id, count in counts:
+            bump_author(user_id, 'posts_count', -count)
+    return deleted
+
+
+def create_posts(posts):
+    """Вставляет несохранённые посты пачками и возвращает их число.
+
+    bulk_create подменяет pub_date текущим временем, поэтому даты
+    постов возвращаются вторым запросом через bulk_update. Базы, которые
+    не отдают id вставленных строк, - это SQLite, а там транзакция с
+    первой вставки держит блокировку записи. Поэтому последние
+    len(posts) id в таблице принадлежат именно этим постам.
+    """
+    if not posts:
+        return 0
+    queryset = Post.objects.all()
+    db_connection = connections[queryset.db]
+    dates = [post.pub_date for post in posts]
+    with transaction.atomic(using=queryset.db):
+        queryset.bulk_create(posts)
+        if not db_connection.features.can_return_ids_from_bulk_insert:
+            ids = queryset.order_by('-pk').values_list('pk', flat=True)
+            for post, pk in zip(posts, reversed(list(ids[:len(posts)]))):
+                post.pk = pk
+        for post, pub_date in zip(posts, dates):
+            post.pub_date = pub_date
+        queryset.bulk_update(posts, ['pub_date'])
+        created = queryset.filter(pk__in=[post.pk for post in posts])
+        counts = list(created.order_by().values_list('author').annotate(
+            count=Count('pk')))
+        if search.is_available():
+            with db_connection.cursor() as cursor:
+                cursor.executemany(
+                    f'INSERT INTO {search.FTS_TABLE}(rowid, text) '
+                    f'VALUES (%s, %s)', [(post.pk, post.text)
+                                         for post in posts])
+        for user_id, count in counts:
+            bump_author(user_id, 'posts_count', count)
+        timeline.fan_out_many(created)
+        _bump_feeds(created.values('pk'), [user_id for user_id, _ in counts])
+    return len(posts)
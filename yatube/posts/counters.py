@@ -0,0 +1,88 @@
+"""
+ Денормализованные счётчики постов, комментариев и подписок.
+"""
+
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import AuthorStats, Post
+
+
+def bump_author(user_id, field, delta):
+    """Изменяет счётчик пользователя одним UPDATE с F()."""
+    stats = AuthorStats.objects.filter(user_id=user_id)
+    if delta < 0:
+        stats = stats.filter(**{f'{field}__gte': -delta})
+    if not stats.update(**{field: F(field) + delta}) and delta > 0:
+        _, created = AuthorStats.objects.get_or_create(
+            user_id=user_id, defaults={field: delta})
+        if not created:
+            stats.update(**{field: F(field) + delta})
+
+
+def bump_comments(post_id, delta):
+    """Изменяет число комментариев поста одним UPDATE с F()."""
+    posts = Post.objects.filter(id=post_id)
+    if delta < 0:
+        posts = posts.filter(comments_count__gte=-delta)
+    posts.update(comments_count=F('comments_count') + delta)
+
+
+def count_of(queryset, field):
+    """Подзапрос с числом строк queryset, где field = OuterRef('pk')."""
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+            field).annotate(count=Count('id')).values('count'),
+        output_field=IntegerField()), 0)
+
+
+def _update_in_batches(queryset, batch_size, **counters):
+    """Обновляет счётчики пачками по диапазонам первичного ключа."""
+    last_pk = 0
+    updated = 0
+    while True:
+        rows = queryset.filter(pk__gt=last_pk)
+        upper = list(rows.order_by('pk').values_list(
+            'pk', flat=True)[batch_size - 1:batch_size])
+        if upper:
+            rows = rows.filter(pk__lte=upper[0])
+        with transaction.atomic():
+            updated += rows.update(**counters)
+        if not upper:
+            return updated
+        last_pk = upper[0]
+
+
+def reconcile(batch_size=10000, apps=global_apps):
+    """Пересчитывает все счётчики по таблицам и возвращает словарь
+    {имя модели: число проверенных строк}.
+
+    apps - реестр моделей; миграции передают сюда исторический.
+    """
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    users = User.objects.filter(stats__isnull=True).values_list(
+        'id', flat=True)
+    while True:
+        batch = list(users[:batch_size])
+        if not batch:
+            break
+        AuthorStats.objects.bulk_create(
+            [AuthorStats(user_id=user_id) for user_id in batch],
+            ignore_conflicts=True)
+    return {
+        'AuthorStats': _update_in_batches(
+            AuthorStats.objects.all(), batch_size,
+            posts_count=count_of(Post.objects.all(), 'author'),
+            followers_count=count_of(Follow.objects.all(), 'author'),
+            following_count=count_of(Follow.objects.all(), 'user')),
+        'Post': _update_in_batches(
+            Post.objects.all(), batch_size,
+            comments_count=count_of(Comment.objects.all(), 'post')),
+    }
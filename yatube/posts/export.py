@@ -0,0 +1,100 @@
+"""
+ Архив автора: посты и комментарии в JSON Lines и исходные картинки.
+
+ Zip собирается на лету и отдаётся кусками, так что в памяти
+ держится только текущий кусок, сколько бы постов ни было у автора.
+"""
+
+import json
+import zipfile
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Comment, Post
+
+# Сколько строк читать из базы за раз
+ITERATOR_CHUNK_SIZE = 2000
+IMAGES_DIR = 'images'
+
+
+class _Stream:
+    """Файл только для записи, из которого можно забирать записанное.
+
+    Без tell() и seek() ZipFile пишет архив последовательно.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _json_lines(archive, name, rows, stream):
+    with archive.open(name, 'w', force_zip64=True) as file_:
+        for row in rows:
+            file_.write(json.dumps(row, cls=DjangoJSONEncoder,
+                                   ensure_ascii=False).encode() + b'\n')
+            yield stream.pop()
+    yield stream.pop()
+
+
+def _images(archive, names, stream):
+    storage = Post._meta.get_field('image').storage
+    for name in names.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        try:
+            source = storage.open(name)
+        except OSError:
+            continue
+        # Картинки уже сжаты, повторно их не сжимаем
+        with source, archive.open(
+                zipfile.ZipInfo(f'{IMAGES_DIR}/{name}'), 'w',
+                force_zip64=True) as file_:
+            for chunk in source.chunks():
+                file_.write(chunk)
+                yield stream.pop()
+        yield stream.pop()
+
+
+def _posts(author):
+    posts = Post.objects.filter(author=author).order_by('pk').values(
+        'id', 'text', 'pub_date', 'group__slug', 'image', 'comments_count')
+    for post in posts.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        image = post.pop('image')
+        yield {'id': post['id'],
+               'text': post['text'],
+               'pub_date': post['pub_date'],
+               'group': post['group__slug'],
+               'image': f'{IMAGES_DIR}/{image}' if image else None,
+               'comments_count': post['comments_count']}
+
+
+def _archive(author, stream):
+    comments = Comment.objects.filter(author=author).order_by('pk').values(
+        'id', 'post_id', 'text', 'created')
+    # Одинаковые картинки лежат в одном файле и попадут в архив один раз
+    images = Post.objects.filter(author=author).exclude(
+        image='').order_by('image').values_list('image', flat=True).distinct()
+    archive = zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED)
+    yield from _json_lines(archive, 'posts.jsonl', _posts(author), stream)
+    yield from _json_lines(
+        archive, 'comments.jsonl',
+        comments.iterator(chunk_size=ITERATOR_CHUNK_SIZE), stream)
+    yield from _images(archive, images, stream)
+    archive.close()
+    yield stream.pop()
+
+
+def author_archive(author):
+    """Отдаёт zip-архив автора кусками байтов."""
+    # Пока сжатые данные копятся внутри zlib, записанных кусков нет
+    return (data for data in _archive(author, _Stream()) if data)
@@ -0,0 +1,121 @@
+"""
+ RSS и Atom с последними постами сайта, группы и автора.
+
+ Ленты кэшируются так же, как HTML-страницы: до смены версии своей
+ области, и на повторный запрос с ETag отвечают 304.
+"""
+
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.shortcuts import get_object_or_404
+from django.template.defaultfilters import linebreaksbr
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.text import Truncator
+
+from core.cache import cache_page_swr
+
+from . import versions
+from .models import Group, Post, User
+
+
+def latest(posts):
+    # Порядок совпадает с индексами (group|author, -pub_date, -id)
+    return posts.select_related('author', 'group').order_by(
+        '-pub_date', '-id')[:settings.SYNDICATION_ITEMS]
+
+
+class PostsFeed(Feed):
+    title = 'Yatube'
+    description = 'Последние записи на Yatube'
+
+    def link(self):
+        return reverse('posts:index')
+
+    def items(self):
+        return latest(Post.objects.all())
+
+    def item_title(self, item):
+        return Truncator(item.text).words(8)
+
+    def item_description(self, item):
+        return linebreaksbr(item.text)
+
+    def item_link(self, item):
+        return reverse('posts:post_detail', kwargs={'post_id': item.id})
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+    def item_categories(self, item):
+        return [item.group.title] if item.group else []
+
+
+class GroupFeed(PostsFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, group):
+        return f'{group.title} - Yatube'
+
+    def description(self, group):
+        return group.description
+
+    def link(self, group):
+        return reverse('posts:group_list', kwargs={'slug': group.slug})
+
+    def items(self, group):
+        return latest(Post.objects.filter(group=group))
+
+
+class AuthorFeed(PostsFeed):
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, author):
+        return f'{author.get_full_name() or author.username} - Yatube'
+
+    def description(self, author):
+        return f'Записи пользователя {author.username}'
+
+    def link(self, author):
+        return reverse('posts:profile', kwargs={'username': author.username})
+
+    def items(self, author):
+        return latest(Post.objects.filter(author=author))
+
+
+class PostsAtomFeed(PostsFeed):
+    feed_type = Atom1Feed
+    subtitle = PostsFeed.description
+
+
+class GroupAtomFeed(GroupFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, group):
+        return group.description
+
+
+class AuthorAtomFeed(AuthorFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, author):
+        return self.description(author)
+
+
+def cached(feed, key_prefix, scope):
+    """Ленты одинаковы для всех, поэтому кэш не делится по куки."""
+    return cache_page_swr(settings.FEED_CACHE_TIMEOUT, key_prefix, scope,
+                          cookies=False)(feed)
+
+
+posts_rss = cached(PostsFeed(), 'posts_rss', versions.index_scope)
+posts_atom = cached(PostsAtomFeed(), 'posts_atom', versions.index_scope)
+group_rss = cached(GroupFeed(), 'group_rss', versions.group_scope)
+group_atom = cached(GroupAtomFeed(), 'group_atom', versions.group_scope)
+author_rss = cached(AuthorFeed(), 'author_rss', versions.profile_scope)
+author_atom = cached(AuthorAtomFeed(), 'author_atom', versions.profile_scope)
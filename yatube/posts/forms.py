@@ -1,12 +1,26 @@
-from django.forms import FileInput, ModelForm, Select, Textarea
+from django.core.files.uploadedfile import UploadedFile
+from django.forms import FileInput, ImageField, ModelForm, Select, Textarea
 
+from .images import RejectedUpload, prepare_upload, set_image_metadata
 from .models import Comment, Post
+from .thumbnails import schedule_thumbnails
+
+
+class UploadImageField(ImageField):
+    """ImageField, который показывает, почему ImageUploadHandler оборвал
+    загрузку картинки."""
+
+    def to_python(self, data):
+        if isinstance(data, RejectedUpload):
+            raise data.error
+        return super().to_python(data)
 
 
 class PostForm(ModelForm):
     class Meta:
         model = Post
         fields = ('text', 'group', 'image')
+        field_classes = {'image': UploadImageField}
         labels = {'text': 'Текст сообщения',
                   'group': 'Группа',
                   'image': 'Картинка'}
@@ -26,6 +40,23 @@ class PostForm(ModelForm):
             })
         }
 
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if isinstance(image, UploadedFile):
+            # Большие картинки уменьшаются, а EXIF удаляется до сохранения
+            image = prepare_upload(image)
+        return image
+
+    def save(self, commit=True):
+        if 'image' in self.changed_data:
+            self.instance.image_variants = ''
+            set_image_metadata(self.instance, self.cleaned_data['image'])
+        post = super().save(commit=commit)
+        if 'image' in self.changed_data:
+            # Миниатюры строятся в фоне, когда пост уже сохранён
+            schedule_thumbnails(post)
+        return post
+
 
 class CommentForm(ModelForm):
     class Meta:
@@ -0,0 +1,224 @@
+"""
+ Обработка картинок постов при загрузке.
+"""
+
+import os
+from base64 import b64encode
+from functools import wraps
+from io import BytesIO
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import InMemoryUploadedFile, UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from PIL import Image, ImageFilter, ImageOps
+
+# Сторона размытой превью, которая показывается, пока грузится картинка
+PLACEHOLDER_SIZE = 16
+# Форматы, которые принимаются при загрузке, и их расширения
+UPLOAD_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+# Сколько байт из начала загрузки копится, чтобы прочитать заголовок
+# картинки; JPEG с большим EXIF бывает нужно несколько блоков
+UPLOAD_HEADER_SIZE = 256 * 1024
+
+
+def read_image_metadata(file_):
+    """Возвращает ширину, высоту и размытую превью картинки в data URI."""
+    file_.seek(0)
+    with Image.open(file_) as image:
+        width, height = image.size
+        # JPEG сразу декодируется в уменьшенном масштабе
+        image.draft('RGB', (PLACEHOLDER_SIZE * 8, PLACEHOLDER_SIZE * 8))
+        preview = image.convert('RGB')
+    file_.seek(0)
+    preview.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    preview = preview.filter(ImageFilter.GaussianBlur(1))
+    buffer = BytesIO()
+    preview.save(buffer, 'JPEG', quality=40)
+    placeholder = b64encode(buffer.getvalue()).decode()
+    return width, height, f'data:image/jpeg;base64,{placeholder}'
+
+
+def set_image_metadata(post, file_):
+    """Записывает в пост размеры и превью картинки file_."""
+    if file_:
+        (post.image_width, post.image_height,
+         post.image_placeholder) = read_image_metadata(file_)
+    else:
+        post.image_width = post.image_height = None
+        post.image_placeholder = ''
+
+
+def _needs_rewrite(image):
+    """Нужно ли перекодировать картинку: она велика или несёт EXIF."""
+    too_large = max(image.size) > settings.IMAGE_MAX_SIDE
+    return too_large or 'exif' in image.info or bool(image.getexif())
+
+
+def _rewrite(image, format_):
+    """Уменьшает картинку, поворачивает её по EXIF и пишет без метаданных.
+
+    JPEG декодируется сразу в уменьшенном масштабе, а результат
+    пишется во временный файл, который держится в памяти, только пока
+    он меньше FILE_UPLOAD_MAX_MEMORY_SIZE.
+    """
+    side = settings.IMAGE_MAX_SIDE
+    image.draft('RGB', (side, side))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((side, side), Image.LANCZOS)
+    for key in ('exif', 'xmp', 'XML:com.adobe.xmp'):
+        image.info.pop(key, None)
+    if format_ == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    output = SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+    options = {'quality': 85, 'optimize': True} if format_ == 'JPEG' else {}
+    image.save(output, format_, **options)
+    return output
+
+
+def _file_too_large():
+    return ValidationError(
+        'Файл больше %(size)d МБ.', code='file_too_large',
+        params={'size': settings.IMAGE_MAX_UPLOAD_SIZE // 1024 ** 2})
+
+
+def check_header(image):
+    """Проверяет формат и число пикселей открытой, но не декодированной
+    картинки."""
+    width, height = image.size
+    if image.format not in UPLOAD_FORMATS:
+        raise ValidationError('Неподдерживаемый формат картинки.',
+                              code='invalid_format')
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        raise ValidationError('Слишком много пикселей в картинке.',
+                              code='too_many_pixels')
+
+
+class RejectedUpload(UploadedFile):
+    """Картинка, загрузку которой оборвал ImageUploadHandler.
+
+    Вместо содержимого хранит ошибку error для поля формы.
+    """
+
+    def __init__(self, name, field_name, error):
+        super().__init__(BytesIO(), name, None, 0)
+        self.field_name = field_name
+        self.error = error
+
+
+class ImageUploadHandler(FileUploadHandler):
+    """Проверяет картинки, пока они загружаются.
+
+    Загрузка обрывается, как только файл перерос IMAGE_MAX_UPLOAD_SIZE
+    или его заголовок из первых блоков показал неподдерживаемый формат
+    или слишком много пикселей. Остаток файла тогда не сохраняется.
+    Блоки передаются дальше стандартным обработчикам.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.rejected = []
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.header = b''
+        self.checked = False
+        if (self.content_length is not None
+                and self.content_length > settings.IMAGE_MAX_UPLOAD_SIZE):
+            self.reject(_file_too_large())
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.IMAGE_MAX_UPLOAD_SIZE:
+            self.reject(_file_too_large())
+        if not self.checked:
+            self.header += raw_data
+            self.check_header()
+        return raw_data
+
+    def check_header(self):
+        try:
+            with Image.open(BytesIO(self.header)) as image:
+                check_header(image)
+        except ValidationError as error:
+            self.reject(error)
+        except Image.DecompressionBombError:
+            self.reject(ValidationError('Слишком много пикселей в картинке.',
+                                        code='too_many_pixels'))
+        except (OSError, SyntaxError, ValueError):
+            # Заголовок ещё не загружен целиком
+            if len(self.header) >= UPLOAD_HEADER_SIZE:
+                self.reject(ValidationError('Не удалось прочитать картинку.',
+                                            code='invalid_image'))
+            return
+        self.checked = True
+        self.header = b''
+
+    def file_complete(self, file_size):
+        # Файл сохранили следующие обработчики
+        return None
+
+    def reject(self, error):
+        self.rejected.append(
+            RejectedUpload(self.file_name, self.field_name, error))
+        raise SkipFile()
+
+
+def check_image_uploads(view):
+    """Ставит представлению ImageUploadHandler.
+
+    Обработчики загрузки можно менять только до разбора тела запроса,
+    а CsrfViewMiddleware разбирает его раньше представления. Поэтому
+    CSRF проверяется внутри, уже после установки обработчика. Оборванные
+    загрузки попадают в request.FILES как RejectedUpload.
+    """
+    protected = csrf_protect(view)
+
+    @csrf_exempt
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        handler = ImageUploadHandler(request)
+        request.upload_handlers.insert(0, handler)
+        if request.method == 'POST':
+            # Обращение к FILES разбирает тело уже с обработчиком
+            files = request.FILES
+            for upload in handler.rejected:
+                files.appendlist(upload.field_name, upload)
+        return protected(request, *args, **kwargs)
+    return wrapper
+
+
+def prepare_upload(file_):
+    """Проверяет загруженную картинку и готовит её к сохранению.
+
+    Сначала по размеру файла и заголовку картинки, ничего не декодируя,
+    отсекает слишком большие файлы и неподдерживаемые форматы. Картинки
+    больше IMAGE_MAX_SIDE уменьшаются, а EXIF удаляется. Возвращает
+    исходный или новый файл.
+    """
+    if file_.size > settings.IMAGE_MAX_UPLOAD_SIZE:
+        raise _file_too_large()
+    output = None
+    file_.seek(0)
+    with Image.open(file_) as image:
+        format_ = image.format
+        width, height = image.size
+        check_header(image)
+        if getattr(image, 'is_animated', False):
+            # Анимацию не перекодируем, чтобы не потерять кадры
+            if max(width, height) > settings.IMAGE_MAX_SIDE:
+                raise ValidationError('Анимация слишком большая.',
+                                      code='animation_too_large')
+        elif _needs_rewrite(image):
+            output = _rewrite(image, format_)
+    file_.seek(0)
+    if output is None:
+        return file_
+    stem = os.path.splitext(os.path.basename(file_.name))[0]
+    size = output.tell()
+    output.seek(0)
+    return InMemoryUploadedFile(output, file_.field_name,
+                                f'{stem}.{UPLOAD_FORMATS[format_]}',
+                                Image.MIME[format_], size, None)
@@ -0,0 +1,24 @@
+"""
+ Сброс карточек постов вместе со страницами, в которые они входят.
+
+ Ленты главной, групп и профилей кэшируются целиком, поэтому новая
+ версия карточки видна в них только после смены версии самой ленты.
+"""
+
+from core.cache import bump_version
+
+from . import versions
+from .models import Post
+
+
+def bump_posts(post_ids):
+    """Сбрасывает карточки постов и ленты, в которых они выводятся."""
+    post_ids = list(post_ids)
+    rows = Post.objects.filter(pk__in=post_ids).values_list(
+        'author__username', 'group__slug').distinct()
+    usernames = {username for username, slug in rows}
+    slugs = {slug for username, slug in rows if slug}
+    bump_version(versions.INDEX,
+                 *(versions.post_scope(post_id) for post_id in post_ids),
+                 *(versions.profile_scope(name) for name in usernames),
+                 *(versions.group_scope(slug) for slug in slugs))
@@ -0,0 +1,153 @@
+import json
+import math
+import os
+from statistics import median
+from time import perf_counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import AuthorStats, Group, Post
+
+DEFAULT_BASELINE = os.path.join(settings.BASE_DIR, 'benchmark_baseline.json')
+# Адрес не из INTERNAL_IPS, чтобы debug toolbar не мешал замерам
+CLIENT_DEFAULTS = {'HTTP_HOST': 'localhost', 'REMOTE_ADDR': '10.0.0.1'}
+# Отдельный кэш на время замеров: холодный режим очищает его, не трогая
+# общий кэш сайта
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark_views',
+    },
+}
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу."""
+    values = sorted(values)
+    return values[max(math.ceil(percent / 100 * len(values)) - 1, 0)]
+
+
+class Command(BaseCommand):
+    help = ('Замеряет p50/p99 времени ответа и число запросов к базе '
+            'основных страниц и сравнивает их с сохранёнными')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50,
+                            help='Сколько запросов к каждой странице')
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE,
+                            help='Файл с базовыми результатами')
+        parser.add_argument('--save', action='store_true',
+                            help='Записать результаты как базовые')
+        parser.add_argument('--tolerance', type=float, default=0.3,
+                            help='Допустимый рост p50, доля от базового')
+
+    def handle(self, *args, **options):
+        scenarios = self.scenarios()
+        with override_settings(CACHES=BENCHMARK_CACHES):
+            try:
+                results = self.run(scenarios, options['requests'])
+            finally:
+                cache.clear()
+        data = {'posts': Post.objects.count(), 'results': results}
+        if options['save']:
+            with open(options['baseline'], 'w') as file_:
+                json.dump(data, file_, indent=2, sort_keys=True)
+            self.stdout.write(f'Результаты сохранены в {options["baseline"]}')
+        elif os.path.exists(options['baseline']):
+            self.compare(data, options['baseline'], options['tolerance'])
+
+    def run(self, scenarios, count):
+        results = {}
+        for name, (url, user) in scenarios.items():
+            client = Client(**CLIENT_DEFAULTS)
+            if user is not None:
+                client.force_login(user)
+            # Без кэша страница собирается из базы, с кэшем - нет
+            for mode, clear in (('cold', True), ('warm', False)):
+                key = f'{name}:{mode}'
+                results[key] = self.measure(client, url, count, clear)
+                self.report(key, results[key])
+        return results
+
+    def scenarios(self):
+        """Адреса страниц с самыми большими лентами в базе."""
+        post = Post.objects.order_by('-comments_count', '-id').first()
+        if post is None:
+            raise CommandError('Нет постов: запустите seed_benchmark')
+        group = Group.objects.annotate(
+            posts_count=Count('posts')).order_by('-posts_count').first()
+        stats = AuthorStats.objects.select_related('user')
+        author = stats.order_by('-posts_count').first()
+        reader = stats.order_by('-following_count').first()
+        if author is None or reader is None:
+            raise CommandError('Нет счётчиков авторов: запустите '
+                               'reconcile_counters или seed_benchmark')
+        author, reader = author.user, reader.user
+        scenarios = {
+            'index': (reverse('posts:index'), None),
+            'profile': (reverse('posts:profile', args=[author.username]),
+                        None),
+            'post_detail': (reverse('posts:post_detail', args=[post.id]),
+                            None),
+            'follow_index': (reverse('posts:follow_index'), reader),
+        }
+        if group is not None:
+            scenarios['group_posts'] = (
+                reverse('posts:group_list', args=[group.slug]), None)
+        return scenarios
+
+    def measure(self, client, url, count, clear):
+        timings = []
+        queries = []
+        if not clear:
+            client.get(url)
+        for _ in range(count):
+            if clear:
+                cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                started = perf_counter()
+                response = client.get(url)
+                timings.append((perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                raise CommandError(f'{url}: ответ {response.status_code}')
+            queries.append(len(captured))
+        return {'p50': round(percentile(timings, 50), 2),
+                'p99': round(percentile(timings, 99), 2),
+                'queries': median(queries)}
+
+    def report(self, key, result):
+        self.stdout.write(f'{key:<20} p50 {result["p50"]:>8.2f} мс   '
+                          f'p99 {result["p99"]:>8.2f} мс   '
+                          f'запросов {result["queries"]:g}')
+
+    def compare(self, data, path, tolerance):
+        """Сравнивает с базовыми результатами и падает на регрессиях."""
+        with open(path) as file_:
+            baseline = json.load(file_)
+        if baseline.get('posts') != data['posts']:
+            self.stderr.write(f'Базовые результаты сняты на '
+                              f'{baseline.get("posts")} постах, а в базе '
+                              f'{data["posts"]}')
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            'Сравнение с базовыми результатами'))
+        regressions = []
+        for key, result in data['results'].items():
+            base = baseline['results'].get(key)
+            if base is None:
+                continue
+            change = (result['p50'] / base['p50'] - 1) if base['p50'] else 0
+            self.stdout.write(f'{key:<20} p50 {change:+.0%}   запросов '
+                              f'{base["queries"]:g} -> '
+                              f'{result["queries"]:g}')
+            if change > tolerance or result['queries'] > base['queries']:
+                regressions.append(key)
+        if regressions:
+            raise CommandError(f'Стало хуже: {", ".join(regressions)}')
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
@@ -0,0 +1,51 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import delete
+
+from posts.images import read_image_metadata
+from posts.invalidation import bump_posts
+from posts.models import Post
+from posts.thumbnails import (THUMBNAILS, build_thumbnails,
+                              get_built_thumbnail, source_file)
+
+
+class Command(BaseCommand):
+    help = ('Строит недостающие миниатюры, варианты и превью '
+            'для уже загруженных картинок')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Перестроить и уже готовые миниатюры')
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').order_by('id').values_list(
+            'id', 'image', 'image_variants', 'image_width')
+        built = 0
+        for post_id, image, variants, width in posts.iterator():
+            if width is None:
+                self.fill_metadata(post_id, image)
+            if not options['force'] and variants and all(
+                    get_built_thumbnail(image, alias) for alias in THUMBNAILS):
+                continue
+            try:
+                if options['force']:
+                    delete(source_file(image), delete_file=False)
+                build_thumbnails(post_id, image)
+            except OSError as error:
+                self.stderr.write(f'{image}: {error}')
+                continue
+            built += 1
+        self.stdout.write(f'Построены миниатюры для картинок: {built}')
+
+    def fill_metadata(self, post_id, image):
+        """Записывает размеры и превью старым картинкам."""
+        try:
+            with default_storage.open(image) as file_:
+                width, height, placeholder = read_image_metadata(file_)
+        except OSError as error:
+            self.stderr.write(f'{image}: {error}')
+            return
+        Post.objects.filter(pk=post_id).update(
+            image_width=width, image_height=height,
+            image_placeholder=placeholder)
+        bump_posts([post_id])
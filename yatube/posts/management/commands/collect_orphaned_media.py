@@ -0,0 +1,118 @@
+import os
+from time import sleep, time
+
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import default, delete
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from posts.models import Post
+from posts.thumbnails import lookup_image_files
+
+
+class Command(BaseCommand):
+    help = ('Удаляет картинки, на которые не ссылается ни один пост, '
+            'и миниатюры, о которых не знает sorl-thumbnail')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Сколько файлов проверять и удалять за раз')
+        parser.add_argument('--sleep', type=float, default=0.5,
+                            help='Пауза между пачками удалений, секунд')
+        parser.add_argument('--min-age', type=int, default=60 * 60,
+                            help='Не трогать файлы моложе стольких секунд')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только показать, что будет удалено')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.modified_before = time() - options['min_age']
+        self.found = 0
+        self.found_size = 0
+        field = Post._meta.get_field('image')
+        for batch in self.batches(self.walk(field.storage, field.upload_to)):
+            referenced = set(Post.objects.filter(
+                image__in=[name for name, size in batch]).values_list(
+                'image', flat=True))
+            self.collect([(name, size) for name, size in batch
+                          if name not in referenced], self.delete_image)
+        thumbnails = self.walk(default.storage, sorl_settings.THUMBNAIL_PREFIX)
+        for batch in self.batches(thumbnails):
+            # Через default.kvstore, а не его таблицу: хранилище ключей
+            # может быть и не в базе
+            known = lookup_image_files(
+                {name: ImageFile(name, default.storage)
+                 for name, size in batch})
+            self.collect([(name, size) for name, size in batch
+                          if known[name] is None], self.delete_thumbnail)
+        verb = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(f'{verb} файлов: {self.found}, '
+                          f'{self.found_size / 1024 ** 2:.1f} МБ')
+
+    def walk(self, storage, top):
+        """Потоково обходит папку хранилища через os.scandir.
+
+        Выдаёт пары (имя файла в хранилище, размер) для файлов старше
+        --min-age: свежая картинка может принадлежать посту, транзакция
+        которого ещё не зафиксирована.
+        """
+        root = storage.path(top)
+        if not os.path.isdir(root):
+            return
+        directories = [root]
+        while directories:
+            with os.scandir(directories.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        directories.append(entry.path)
+                        continue
+                    stat = entry.stat(follow_symlinks=False)
+                    if (entry.is_file(follow_symlinks=False)
+                            and stat.st_mtime < self.modified_before):
+                        name = os.path.relpath(entry.path, storage.location)
+                        yield name.replace(os.sep, '/'), stat.st_size
+
+    def batches(self, files):
+        batch = []
+        for file_ in files:
+            batch.append(file_)
+            if len(batch) == self.options['batch_size']:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def collect(self, orphans, remove):
+        """Удаляет пачку ненужных файлов и выдерживает паузу."""
+        for name, size in orphans:
+            if self.options['dry_run']:
+                if self.options['verbosity'] > 1:
+                    self.stdout.write(name)
+            elif remove(name) is False:
+                continue
+            self.found += 1
+            self.found_size += size
+        if orphans and not self.options['dry_run']:
+            sleep(self.options['sleep'])
+
+    def delete_image(self, name):
+        """Удаляет картинку, если на неё так и не сослался новый пост.
+
+        Между проверкой пачки и удалением загрузка с тем же содержимым
+        могла переиспользовать файл: тогда у него свежий mtime, а после
+        фиксации транзакции - ссылка из поста.
+        """
+        storage = Post._meta.get_field('image').storage
+        try:
+            if os.path.getmtime(storage.path(name)) >= self.modified_before:
+                return False
+        except FileNotFoundError:
+            return False
+        if Post.objects.filter(image=name).exists():
+            return False
+        # Вместе с картинкой sorl удаляет её миниатюры и записи о них
+        delete(ImageFile(name, storage))
+        return True
+
+    def delete_thumbnail(self, name):
+        default.storage.delete(name)
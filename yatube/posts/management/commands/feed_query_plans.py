@@ -0,0 +1,94 @@
+from time import perf_counter
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from posts.models import Comment, Follow, Post
+
+# Модели, индексы и ограничения которых снимаются для замера «до»
+INDEXED_MODELS = (Post, Comment, Follow)
+
+
+class Command(BaseCommand):
+    help = ('Печатает планы и время запросов лент с индексами '
+            'из Meta.indexes и без них')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Сколько постов создать перед замером '
+                                 'через seed_benchmark, если данных для '
+                                 'замеров ещё нет')
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            self.seed(options['seed'])
+        post = Post.objects.order_by('-comments_count').first()
+        follow = Follow.objects.first()
+        if post is None:
+            self.stderr.write('Нет постов: запустите команду с --seed')
+            return
+        queries = {
+            'index': Post.objects.order_by('-pub_date', '-id')[:11],
+            'index, курсор': Post.objects.filter(
+                pub_date__lt=post.pub_date).order_by('-pub_date', '-id')[:11],
+            'group_posts': Post.objects.filter(
+                group=post.group_id).order_by('-pub_date', '-id')[:11],
+            'profile': Post.objects.filter(
+                author=post.author_id).order_by('-pub_date', '-id')[:11],
+            'comments': Comment.objects.filter(
+                post=post).order_by('created', 'id')[:11],
+        }
+        if follow:
+            queries['follow exists'] = Follow.objects.filter(
+                user=follow.user_id, author=follow.author_id)
+        # В SQLite уникальное ограничение снимается только пересозданием
+        # таблицы, а его редактор схемы не работает внутри транзакции,
+        # поэтому индексы возвращаются явно, а не откатом
+        self.stdout.write(self.style.MIGRATE_HEADING('До: без индексов'))
+        with connection.schema_editor() as schema_editor:
+            self.drop_indexes(schema_editor)
+        try:
+            self.explain(queries)
+        finally:
+            with connection.schema_editor() as schema_editor:
+                self.restore_indexes(schema_editor)
+        self.stdout.write(self.style.MIGRATE_HEADING('После: с индексами'))
+        self.explain(queries)
+
+    def drop_indexes(self, schema_editor):
+        for model in INDEXED_MODELS:
+            for index in model._meta.indexes:
+                schema_editor.remove_index(model, index)
+            # Проверка подписки идёт по индексу уникального ограничения.
+            # SQLite снимает его, пересоздавая таблицу по Meta модели,
+            # поэтому на это время ограничения в Meta нет
+            constraints = model._meta.constraints
+            for constraint in constraints:
+                model._meta.constraints = [other for other in constraints
+                                           if other is not constraint]
+                try:
+                    schema_editor.remove_constraint(model, constraint)
+                finally:
+                    model._meta.constraints = constraints
+
+    def restore_indexes(self, schema_editor):
+        for model in INDEXED_MODELS:
+            for index in model._meta.indexes:
+                schema_editor.add_index(model, index)
+            for constraint in model._meta.constraints:
+                schema_editor.add_constraint(model, constraint)
+
+    def explain(self, queries):
+        for name, queryset in queries.items():
+            started = perf_counter()
+            list(queryset.all())
+            elapsed = (perf_counter() - started) * 1000
+            self.stdout.write(f'{name}: {elapsed:.2f} мс')
+            self.stdout.write(queryset.explain())
+
+    def seed(self, posts_count):
+        call_command('seed_benchmark', posts=posts_count,
+                     users=max(posts_count // 100, 1),
+                     comments=posts_count * 2, stdout=self.stdout,
+                     stderr=self.stderr)
@@ -0,0 +1,186 @@
+import csv
+import json
+import os
+import sys
+from itertools import islice
+from time import monotonic
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts.bulk import create_posts
+from posts.models import Group, ImportState, Post, User
+
+# Как часто печатать ход импорта, в секундах
+PROGRESS_INTERVAL = 5
+
+
+class Command(BaseCommand):
+    help = ('Импортирует посты из JSONL или CSV с полями text, author, '
+            'group и pub_date пачками в отдельных транзакциях')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл с постами или - для stdin')
+        parser.add_argument('--format', choices=('jsonl', 'csv'),
+                            help='Формат; по умолчанию по расширению файла')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Сколько постов сохранять в одной '
+                                 'транзакции')
+        parser.add_argument('--create-authors', action='store_true',
+                            help='Создавать неизвестных авторов, а не '
+                                 'пропускать их посты')
+        parser.add_argument('--state',
+                            help='Ключ, под которым в базе хранится число '
+                                 'обработанных записей; по умолчанию '
+                                 'полный путь к файлу')
+        parser.add_argument('--restart', action='store_true',
+                            help='Начать сначала, не глядя на сохранённое '
+                                 'состояние')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        self.verbosity = options['verbosity']
+        self.source = options['state'] or (
+            None if path == '-' else os.path.abspath(path))
+        self.create_authors = options['create_authors']
+        self.groups = dict(Group.objects.values_list('slug', 'id'))
+        self.authors = {}
+        self.skipped = 0
+        done = 0 if options['restart'] else self.read_state()
+        format_ = options['format'] or self.guess_format(path)
+        imported = 0
+        started = last_report = monotonic()
+        with self.open(path) as file_:
+            records = enumerate(self.read(file_, format_), 1)
+            # Записи, сохранённые до сбоя, читаются и пропускаются
+            for _ in islice(records, done):
+                pass
+            while True:
+                chunk = list(islice(records, options['batch_size']))
+                if not chunk:
+                    break
+                done = chunk[-1][0]
+                # Состояние пишется в той же транзакции, что и посты:
+                # после сбоя пачка не импортируется второй раз
+                with transaction.atomic():
+                    imported += create_posts(self.build_posts(chunk))
+                    self.write_state(done)
+                if monotonic() - last_report >= PROGRESS_INTERVAL:
+                    last_report = monotonic()
+                    self.report(done, imported, last_report - started)
+        self.report(done, imported, monotonic() - started)
+
+    def guess_format(self, path):
+        extension = os.path.splitext(path)[1].lower()
+        if extension in ('.jsonl', '.ndjson'):
+            return 'jsonl'
+        if extension == '.csv':
+            return 'csv'
+        raise CommandError('Укажите формат через --format')
+
+    def open(self, path):
+        if path == '-':
+            return open(sys.stdin.fileno(), encoding='utf-8', newline='',
+                        closefd=False)
+        try:
+            return open(path, encoding='utf-8', newline='')
+        except OSError as error:
+            raise CommandError(error)
+
+    def read(self, file_, format_):
+        """Записи файла по одной; битые строки дают None."""
+        if format_ == 'csv':
+            yield from csv.DictReader(file_)
+            return
+        for line in file_:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield record if isinstance(record, dict) else None
+
+    def read_state(self):
+        if self.source is None:
+            return 0
+        done = ImportState.objects.filter(source=self.source).values_list(
+            'position', flat=True).first() or 0
+        if done:
+            self.stdout.write(f'Продолжение после записи {done}')
+        return done
+
+    def write_state(self, done):
+        if self.source is None:
+            return
+        ImportState.objects.update_or_create(
+            source=self.source, defaults={'position': done})
+
+    def build_posts(self, chunk):
+        self.resolve_authors({record.get('author') for _, record in chunk
+                              if record})
+        posts = []
+        for number, record in chunk:
+            post, error = self.build_post(record)
+            if post is None:
+                self.skipped += 1
+                if self.verbosity > 1:
+                    self.stderr.write(f'Запись {number}: {error}')
+            else:
+                posts.append(post)
+        return posts
+
+    def resolve_authors(self, usernames):
+        """Дополняет словарь авторов одним запросом на пачку."""
+        missing = {name for name in usernames
+                   if name and name not in self.authors}
+        if not missing:
+            return
+        self.authors.update(User.objects.filter(
+            username__in=missing).values_list('username', 'id'))
+        missing -= self.authors.keys()
+        if missing and self.create_authors:
+            User.objects.bulk_create(
+                [User(username=name, password=make_password(None))
+                 for name in missing], ignore_conflicts=True)
+            self.authors.update(User.objects.filter(
+                username__in=missing).values_list('username', 'id'))
+
+    def build_post(self, record):
+        """Пост из записи или None и причина, по которой он пропущен."""
+        if record is None:
+            return None, 'не разобрать запись'
+        text = record.get('text')
+        if not text:
+            return None, 'нет текста'
+        author_id = self.authors.get(record.get('author'))
+        if author_id is None:
+            return None, f'неизвестный автор {record.get("author")!r}'
+        group_id = None
+        if record.get('group'):
+            group_id = self.groups.get(record['group'])
+            if group_id is None:
+                return None, f'неизвестная группа {record["group"]!r}'
+        pub_date = timezone.now()
+        if record.get('pub_date'):
+            pub_date = self.parse_date(record['pub_date'])
+            if pub_date is None:
+                return None, f'неверная дата {record["pub_date"]!r}'
+        return Post(text=text, author_id=author_id, group_id=group_id,
+                    pub_date=pub_date), None
+
+    def parse_date(self, value):
+        try:
+            pub_date = parse_datetime(str(value))
+        except ValueError:
+            return None
+        if pub_date is not None and timezone.is_naive(pub_date):
+            pub_date = timezone.make_aware(pub_date)
+        return pub_date
+
+    def report(self, done, imported, elapsed):
+        rate = imported / elapsed if elapsed else 0
+        self.stdout.write(f'Обработано записей: {done}, импортировано '
+                          f'постов: {imported}, пропущено: {self.skipped} '
+                          f'({rate:.0f} в секунду)')
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from posts import search
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000,
+                            help='Сколько постов индексировать за раз')
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError('Полнотекстовый индекс есть только в SQLite')
+        table = search.FTS_TABLE
+        batch_size = options['batch_size']
+        # Одна транзакция: пока индекс строится, поиск видит старый
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {table}')
+            last_pk = 0
+            indexed = 0
+            while True:
+                batch = list(Post.objects.filter(pk__gt=last_pk).order_by(
+                    'pk').values_list('pk', 'text')[:batch_size])
+                if not batch:
+                    break
+                cursor.executemany(
+                    f'INSERT INTO {table}(rowid, text) VALUES (%s, %s)',
+                    batch)
+                last_pk = batch[-1][0]
+                indexed += len(batch)
+            # Сливает сегменты индекса, чтобы поиск читал меньше страниц
+            cursor.execute(f"INSERT INTO {table}({table}) VALUES ('optimize')")
+        self.stdout.write(f'Проиндексировано постов: {indexed}')
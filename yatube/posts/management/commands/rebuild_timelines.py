@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = 'Заново раскладывает ленты подписок пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*',
+                            help='Пользователи; по умолчанию все')
+
+    def handle(self, *args, **options):
+        # Раскладки бывших «звёзд», которые не успел сделать фон
+        cooled = timeline.finish_cool_downs()
+        if cooled:
+            self.stdout.write(f'Разложены посты бывших «звёзд»: {cooled}')
+        users = User.objects.order_by('id')
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+        rebuilt = 0
+        for user in users.iterator():
+            timeline.rebuild(user)
+            rebuilt += 1
+        self.stdout.write(f'Лент пересобрано: {rebuilt}')
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, комментариев и подписок'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000,
+                            help='Сколько строк обновлять за один UPDATE')
+
+    def handle(self, *args, **options):
+        updated = reconcile(options['batch_size'])
+        for name, count in updated.items():
+            self.stdout.write(f'{name}: проверено строк {count}')
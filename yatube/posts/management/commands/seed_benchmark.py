@@ -0,0 +1,173 @@
+import random
+from datetime import timedelta
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from posts.bulk import create_posts
+from posts.models import Comment, Follow, Group, Post, User
+
+PREFIX = 'bench'
+WORDS = ('кошка', 'собака', 'город', 'утро', 'дорога', 'книга', 'море',
+         'снег', 'поезд', 'сад', 'музыка', 'вечер', 'лес', 'чай')
+
+
+class PowerLaw:
+    """Выбор индекса из range(size) с весами 1 / (i + 1) ** alpha.
+
+    Несколько первых индексов выпадают часто, остальные - редко, как
+    популярные авторы и посты на настоящем сайте.
+    """
+
+    def __init__(self, rng, size, alpha):
+        self.rng = rng
+        self.population = range(size)
+        self.cum_weights = list(accumulate(
+            1 / (index + 1) ** alpha for index in self.population))
+
+    def sample(self, count):
+        return self.rng.choices(self.population, cum_weights=self.cum_weights,
+                                k=count)
+
+
+class Command(BaseCommand):
+    help = ('Создаёт данные для замеров: пользователей, группы, посты, '
+            'комментарии и подписки со степенным распределением')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=200000)
+        parser.add_argument('--follows', type=int, default=20,
+                            help='Сколько в среднем подписок у пользователя')
+        parser.add_argument('--alpha', type=float, default=1.1,
+                            help='Показатель степенного распределения')
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько дней раскидать даты постов')
+        parser.add_argument('--random-seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__startswith=f'{PREFIX}_').exists():
+            self.stderr.write('Данные для замеров уже есть')
+            return
+        self.options = options
+        self.rng = random.Random(options['random_seed'])
+        self.batch_size = options['batch_size']
+        users = self.create_users()
+        groups = self.create_groups()
+        # Подписки нужны до постов, чтобы посты разложились по лентам
+        self.create_follows(users)
+        self.create_posts(users, groups)
+        self.create_comments(users)
+        call_command('reconcile_counters', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS('Данные для замеров созданы'))
+
+    def law(self, size):
+        return PowerLaw(self.rng, size, self.options['alpha'])
+
+    def in_batches(self, objects):
+        objects = iter(objects)
+        while True:
+            batch = list(islice(objects, self.batch_size))
+            if not batch:
+                return
+            yield batch
+
+    def text(self, words):
+        return ' '.join(self.rng.choices(WORDS, k=words)).capitalize()
+
+    def create_users(self):
+        # Хэш пароля один на всех: его вычисление медленное
+        password = make_password(PREFIX)
+        User.objects.bulk_create(
+            (User(username=f'{PREFIX}_{num}', password=password)
+             for num in range(self.options['users'])),
+            batch_size=self.batch_size)
+        users = list(User.objects.filter(
+            username__startswith=f'{PREFIX}_').order_by('id').values_list(
+            'id', flat=True))
+        self.stdout.write(f'Пользователей: {len(users)}')
+        return users
+
+    def create_groups(self):
+        Group.objects.bulk_create(
+            Group(title=f'Группа {num}', slug=f'{PREFIX}-{num}',
+                  description=self.text(12))
+            for num in range(self.options['groups']))
+        groups = list(Group.objects.filter(
+            slug__startswith=f'{PREFIX}-').order_by('id').values_list(
+            'id', flat=True))
+        self.stdout.write(f'Групп: {len(groups)}')
+        return groups
+
+    def create_follows(self, users):
+        """Подписки: у каждого своё число, авторов выбирает степенной закон.
+
+        Поэтому у нескольких «звёзд» подписчиков очень много.
+        """
+        authors = self.law(len(users))
+        mean = self.options['follows']
+        follows = set()
+        for user_id in users:
+            count = min(int(self.rng.paretovariate(1.5) * mean / 3),
+                        len(users) - 1)
+            follows.update((user_id, users[index])
+                           for index in authors.sample(count)
+                           if users[index] != user_id)
+        for batch in self.in_batches(
+                Follow(user_id=user_id, author_id=author_id)
+                for user_id, author_id in follows):
+            Follow.objects.bulk_create(batch, ignore_conflicts=True)
+        self.stdout.write(f'Подписок: {len(follows)}')
+
+    def create_posts(self, users, groups):
+        authors = self.law(len(users))
+        group_law = self.law(len(groups))
+        seconds = self.options['days'] * 24 * 60 * 60
+        now = timezone.now()
+        created = 0
+        for batch in self.in_batches(range(self.options['posts'])):
+            posts = []
+            author_indexes = authors.sample(len(batch))
+            group_indexes = group_law.sample(len(batch))
+            for author_index, group_index in zip(author_indexes,
+                                                 group_indexes):
+                # Часть постов публикуется без группы
+                group_id = None
+                if self.rng.random() < 0.7:
+                    group_id = groups[group_index]
+                posts.append(Post(
+                    text=self.text(self.rng.randint(5, 60)),
+                    author_id=users[author_index],
+                    group_id=group_id,
+                    pub_date=now - timedelta(
+                        seconds=self.rng.randint(0, seconds))))
+            created += create_posts(posts)
+            self.stdout.write(f'Постов: {created}')
+
+    def create_comments(self, users):
+        posts = list(Post.objects.filter(
+            author__username__startswith=f'{PREFIX}_').order_by(
+            'id').values_list('id', flat=True))
+        if not posts:
+            return
+        targets = self.law(len(posts))
+        commenters = self.law(len(users))
+        created = 0
+        for batch in self.in_batches(range(self.options['comments'])):
+            comments = [
+                Comment(post_id=posts[post_index], author_id=users[user_index],
+                        text=self.text(self.rng.randint(3, 20)))
+                for post_index, user_index in zip(
+                    targets.sample(len(batch)),
+                    commenters.sample(len(batch)))]
+            with transaction.atomic():
+                Comment.objects.bulk_create(comments)
+            created += len(comments)
+        self.stdout.write(f'Комментариев: {created}')
@@ -0,0 +1,79 @@
+import os
+
+from django.core.management.base import BaseCommand
+from django.db.models import Case, F, Value, When
+
+from core.storage import is_hashed_name
+from posts.invalidation import bump_posts
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Переносит картинки постов в раскладку по хэшу содержимого '
+            'и переписывает пути в Post.image')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Сколько постов переносить за раз')
+        parser.add_argument('--keep-old', action='store_true',
+                            help='Не удалять файлы из старой раскладки')
+
+    def handle(self, *args, **options):
+        self.storage = Post._meta.get_field('image').storage
+        last_pk = 0
+        moved = 0
+        while True:
+            batch = list(Post.objects.filter(pk__gt=last_pk).exclude(
+                image='').order_by('pk').values_list('pk', 'image')[
+                :options['batch_size']])
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+            moved += self.move_batch(batch)
+        self.stdout.write(f'Перенесено картинок: {moved}')
+        if not options['keep_old']:
+            removed = self.remove_old_copies()
+            self.stdout.write(f'Удалено старых файлов: {removed}')
+
+    def move_batch(self, batch):
+        """Копирует файлы пачки по хэшу и переписывает пути одним UPDATE."""
+        renames = {}
+        for pk, name in batch:
+            if is_hashed_name(name) or name in renames:
+                continue
+            try:
+                with self.storage.open(name) as file_:
+                    renames[name] = self.storage.save(name, file_)
+            except OSError as error:
+                self.stderr.write(f'{name}: {error}')
+        moved = [(pk, name) for pk, name in batch if name in renames]
+        if not moved:
+            return 0
+        Post.objects.filter(pk__in=[pk for pk, name in moved]).update(
+            image=Case(*(When(pk=pk, image=name, then=Value(renames[name]))
+                         for pk, name in moved),
+                       default=F('image')))
+        # Кэшированные ленты и ответы API ссылаются на старые файлы,
+        # которые удалит remove_old_copies
+        bump_posts(pk for pk, name in moved)
+        return len(moved)
+
+    def remove_old_copies(self):
+        """Удаляет старые файлы, содержимое которых уже лежит по хэшу.
+
+        Папка читается потоково через os.scandir, так что даже миллионы
+        файлов не собираются в один список.
+        """
+        upload_to = Post._meta.get_field('image').upload_to
+        removed = 0
+        with os.scandir(self.storage.path(upload_to)) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                name = os.path.join(upload_to, entry.name)
+                with self.storage.open(name) as file_:
+                    hashed = self.storage.hashed_name(name, file_)
+                if self.storage.exists(hashed):
+                    self.storage.delete(name)
+                    removed += 1
+        return removed
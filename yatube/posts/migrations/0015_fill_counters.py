@@ -0,0 +1,23 @@
+from django.db import migrations
+
+from posts.counters import reconcile
+
+
+def fill_counters(apps, schema_editor):
+    """Заполняет счётчики для данных, созданных до 0009.
+
+    Без этого у старых авторов было бы 0 постов и подписчиков, а 0016
+    разложила бы по лентам и посты «звёзд».
+    """
+    reconcile(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_post_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
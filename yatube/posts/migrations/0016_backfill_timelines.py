@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.db import migrations
+
+
+def backfill_timelines(apps, schema_editor):
+    """Раскладывает уже опубликованные посты по лентам подписчиков.
+
+    Таблица лент появилась в 0008 пустой, и без этого ленты подписок
+    после обновления были бы пустыми. Посты «звёзд» в ленты не идут.
+    """
+    Follow = apps.get_model('posts', 'Follow')
+    Timeline = apps.get_model('posts', 'Timeline')
+    rows = Follow.objects.filter(author__posts__isnull=False).exclude(
+        author__stats__followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).values_list('user', 'author__posts__id', 'author__posts__pub_date')
+    sql, params = rows.query.sql_with_params()
+    ops = schema_editor.connection.ops
+    schema_editor.execute(
+        f'{ops.insert_statement(ignore_conflicts=True)} '
+        f'{Timeline._meta.db_table} (user_id, post_id, pub_date) {sql} '
+        f'{ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}',
+        params)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_fill_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_timelines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 2.2.16 on 2026-10-17 05:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_hot_authors(apps, schema_editor):
+    """Отмечает «звёзд», чьи посты 0016 не разложила по лентам."""
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    AuthorStats.objects.filter(
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT).update(hot=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_import_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authorstats',
+            name='cooling',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='authorstats',
+            name='hot',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_hot_authors, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from core.storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
@@ -28,10 +30,30 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
-        blank=True)
+        storage=ContentAddressedStorage(),
+        blank=True,
+        db_index=True)
+    # Размеры и размытая превью картинки в data URI, чтобы выводить
+    # её без обращения к хранилищу; заполняются в PostForm
+    image_width = models.PositiveIntegerField(null=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, editable=False)
+    image_placeholder = models.TextField(blank=True, default='',
+                                         editable=False)
+    # JSON с вариантами картинки разной ширины и формата для srcset,
+    # заполняется в фоне вместе с миниатюрами
+    image_variants = models.TextField(blank=True, default='', editable=False)
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ["-pub_date"]
+        indexes = [
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_id_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -47,6 +69,12 @@ class Comment(models.Model):
     text = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created', 'id'],
+                         name='comment_post_created_idx'),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(User,
@@ -55,3 +83,61 @@ class Follow(models.Model):
     author = models.ForeignKey(User,
                                on_delete=models.CASCADE,
                                related_name='following')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'author'],
+                                    name='unique_follow'),
+        ]
+
+
+class Timeline(models.Model):
+    """Лента подписок, заранее разложенная по пользователям."""
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name='timeline')
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name='timeline_entries')
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-pub_date', '-post']
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_pub_date_idx'),
+        ]
+
+
+class AuthorStats(models.Model):
+    """Счётчики пользователя, обновляемые при записи постов и подписок."""
+    user = models.OneToOneField(User,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name='stats')
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+    # Посты «звезды» не раскладываются по лентам, а читаются при открытии
+    # ленты; cooling - её посты раскладываются в фоне, после чего hot
+    # снимается
+    hot = models.BooleanField(default=False)
+    cooling = models.BooleanField(default=False)
+
+    @classmethod
+    def get_for(cls, user):
+        """Возвращает счётчики пользователя, не обращаясь к агрегатам."""
+        try:
+            return user.stats
+        except cls.DoesNotExist:
+            return cls(user=user)
+
+
+class ImportState(models.Model):
+    """Сколько записей источника уже импортировано командой import_posts."""
+    source = models.CharField(max_length=500, unique=True)
+    position = models.PositiveIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f'{self.source}: {self.position}'
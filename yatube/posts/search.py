@@ -0,0 +1,110 @@
+"""
+ Полнотекстовый поиск по постам на индексе SQLite FTS5.
+
+ Индекс - отдельная таблица posts_post_fts, где rowid совпадает с id
+ поста. Её заполняет миграция, обновляют сигналы Post, а целиком
+ перестраивает команда rebuild_search_index.
+"""
+
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.encoding import force_bytes, force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from core.paginator import CursorPage
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+WORD = re.compile(r'\w+')
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def to_match_query(query):
+    """Запрос FTS5 из текста пользователя: все слова, последнее - префикс.
+
+    Слова берутся в кавычки, так что операторы FTS5 в тексте не работают
+    и не могут сломать запрос.
+    """
+    words = WORD.findall(query)
+    if not words:
+        return ''
+    return ' '.join(f'"{word}"' for word in words) + '*'
+
+
+def index_post(post):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                       [post.pk])
+        cursor.execute(f'INSERT INTO {FTS_TABLE}(rowid, text) '
+                       f'VALUES (%s, %s)', [post.pk, post.text])
+
+
+def unindex_post(post_id):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                       [post_id])
+
+
+def matching(queryset, query):
+    """Оставляет в queryset посты, текст которых подходит под query."""
+    match = to_match_query(query)
+    if not match:
+        return queryset.none()
+    return queryset.filter(id__in=RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        [match]))
+
+
+def encode_cursor(rank, post_id):
+    return urlsafe_base64_encode(force_bytes(f'{rank!r}|{post_id}'))
+
+
+def decode_cursor(cursor):
+    """Возвращает пару (rank, id) или None для плохого курсора."""
+    if not cursor:
+        return None
+    try:
+        rank, post_id = force_str(urlsafe_base64_decode(cursor)).split('|')
+        return float(rank), int(post_id)
+    except (TypeError, ValueError):
+        return None
+
+
+def search_page(query, per_page, after=None):
+    """Страница постов, отсортированных по релевантности (bm25).
+
+    Листается курсором ``after`` по паре (rank, id) прямо в индексе,
+    без OFFSET и COUNT(*).
+    """
+    match = to_match_query(query)
+    if not match:
+        return CursorPage([], None, None, None)
+    sql = (f'SELECT rowid, rank FROM {FTS_TABLE} '
+           f'WHERE {FTS_TABLE} MATCH %s')
+    params = [match]
+    key = decode_cursor(after)
+    if key is not None:
+        sql += ' AND (rank > %s OR (rank = %s AND rowid > %s))'
+        params += [key[0], key[0], key[1]]
+    sql += ' ORDER BY rank, rowid LIMIT %s'
+    params.append(per_page + 1)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    posts = Post.objects.select_related('group', 'author').in_bulk(
+        [post_id for post_id, rank in rows])
+    object_list = [posts[post_id] for post_id, rank in rows
+                   if post_id in posts]
+    next_cursor = None
+    if has_next:
+        post_id, rank = rows[-1]
+        next_cursor = encode_cursor(rank, post_id)
+    return CursorPage(object_list, None, next_cursor, previous_cursor=None)
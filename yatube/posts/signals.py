@@ -0,0 +1,185 @@
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from core.cache import bump_version
+
+from . import search, timeline, versions
+from .counters import bump_author, bump_comments
+from .models import Comment, Follow, Group, Post, User
+
+
+def bump_feeds(post, group_ids=()):
+    """Сбрасывает кэш лент, в которых виден пост."""
+    group_ids = {group_id for group_id in (post.group_id, *group_ids)
+                 if group_id is not None}
+    slugs = Group.objects.filter(id__in=group_ids).values_list(
+        'slug', flat=True)
+    username = User.objects.filter(id=post.author_id).values_list(
+        'username', flat=True).first()
+    bump_version(versions.INDEX,
+                 versions.post_scope(post.id),
+                 versions.profile_scope(username),
+                 *(versions.group_scope(slug) for slug in slugs))
+
+
+@receiver(pre_save, sender=Post)
+def remember_old_group(sender, instance, raw=False, **kwargs):
+    instance._old_group_id = None
+    if instance.pk and not raw:
+        instance._old_group_id = Post.objects.filter(
+            pk=instance.pk).values_list('group_id', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def invalidate_saved_post(sender, instance, **kwargs):
+    bump_feeds(instance, [getattr(instance, '_old_group_id', None)])
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_deleted_post(sender, instance, **kwargs):
+    bump_feeds(instance)
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, update_fields=None, **kwargs):
+    text_changed = update_fields is None or 'text' in update_fields
+    if text_changed and search.is_available():
+        search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_deleted_post(sender, instance, **kwargs):
+    if search.is_available():
+        search.unindex_post(instance.pk)
+
+
+@receiver(pre_save, sender=Group)
+def remember_old_slug(sender, instance, raw=False, **kwargs):
+    instance._old_slug = None
+    if instance.pk and not raw:
+        instance._old_slug = Group.objects.filter(
+            pk=instance.pk).values_list('slug', flat=True).first()
+
+
+def group_authors(group):
+    return list(User.objects.filter(posts__group=group).values_list(
+        'username', flat=True).distinct())
+
+
+def bump_group(group, old_slug=None, usernames=None):
+    """Сбрасывает страницы со ссылками на группу и с её карточками.
+
+    После смены slug старый адрес группы тоже нужно сбросить, иначе он
+    будет отдаваться из кэша. Карточки постов группы есть и в профилях
+    их авторов.
+    """
+    if usernames is None:
+        usernames = group_authors(group)
+    slugs = {slug for slug in (group.slug, old_slug) if slug}
+    bump_version(versions.GROUPS,
+                 versions.INDEX,
+                 versions.group_card_scope(group.id),
+                 *(versions.group_scope(slug) for slug in slugs),
+                 *(versions.profile_scope(name) for name in usernames))
+
+
+@receiver(post_save, sender=Group)
+def invalidate_saved_group(sender, instance, **kwargs):
+    bump_group(instance, getattr(instance, '_old_slug', None))
+
+
+@receiver(pre_delete, sender=Group)
+def remember_group_authors(sender, instance, **kwargs):
+    instance._authors = group_authors(instance)
+
+
+@receiver(post_delete, sender=Group)
+def invalidate_deleted_group(sender, instance, **kwargs):
+    # Посты остаются без группы через SET NULL, сигналы Post не приходят
+    bump_group(instance, usernames=getattr(instance, '_authors', []))
+
+
+@receiver(pre_save, sender=User)
+def remember_old_username(sender, instance, raw=False, update_fields=None,
+                          **kwargs):
+    instance._old_username = None
+    login_only = (update_fields is not None
+                  and set(update_fields) == {'last_login'})
+    if instance.pk and not raw and not login_only:
+        instance._old_username = User.objects.filter(
+            pk=instance.pk).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_cards(sender, instance, created, update_fields=None,
+                            **kwargs):
+    # Вход на сайт сохраняет только last_login - карточки не меняются
+    login_only = (update_fields is not None
+                  and set(update_fields) == {'last_login'})
+    if created or login_only:
+        return
+    # Имя автора выводится и в лентах групп, где есть его посты
+    slugs = Group.objects.filter(posts__author=instance).values_list(
+        'slug', flat=True).distinct()
+    usernames = {instance.username,
+                 getattr(instance, '_old_username', None)} - {None}
+    bump_version(versions.INDEX,
+                 versions.user_scope(instance.id),
+                 *(versions.profile_scope(name) for name in usernames),
+                 *(versions.group_scope(slug) for slug in slugs))
+
+
+@receiver([post_save, post_delete], sender=Follow)
+def invalidate_followed_profile(sender, instance, **kwargs):
+    username = User.objects.filter(id=instance.author_id).values_list(
+        'username', flat=True).first()
+    bump_version(versions.profile_scope(username))
+
+
+@receiver(post_save, sender=Post)
+def count_created_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        bump_author(instance.author_id, 'posts_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    bump_author(instance.author_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_created_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        bump_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    bump_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_created_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        bump_author(instance.author_id, 'followers_count', 1)
+        bump_author(instance.user_id, 'following_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    bump_author(instance.author_id, 'followers_count', -1)
+    bump_author(instance.user_id, 'following_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def heat_up_author(sender, instance, created, raw=False, **kwargs):
+    # Подписка, после которой автор стал «звездой»
+    if created and not raw:
+        timeline.heat_up(instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def cool_down_author(sender, instance, **kwargs):
+    # Отписка, после которой посты «звезды» снова раскладываются по лентам
+    timeline.start_cool_down(instance.author_id)
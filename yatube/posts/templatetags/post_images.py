@@ -0,0 +1,65 @@
+from django import template
+from django.core.cache import cache
+
+from ..thumbnails import (get_built_thumbnail, get_image_sources,
+                          schedule_thumbnails)
+
+register = template.Library()
+
+# Как часто повторять постановку миниатюр в фон, в секундах. Столько же
+# живёт в кэше карточка, пока вариантов картинки нет: если задачу на
+# сборку потеряли, карточка перерисуется и поставит её снова.
+RETRY_TIMEOUT = 60
+
+
+@register.simple_tag
+def post_thumbnail(post, alias):
+    """Готовая миниатюра картинки поста или None, если её ещё нет.
+
+    Сначала смотрит в post.prefetched_thumbnails, заполненный для всей
+    страницы ленты. Отсутствующая миниатюра ставится в фон не чаще
+    раза в RETRY_TIMEOUT секунд.
+    """
+    prefetched = getattr(post, 'prefetched_thumbnails', {})
+    if alias in prefetched:
+        thumbnail = prefetched[alias]
+    else:
+        thumbnail = get_built_thumbnail(post.image, alias)
+    if thumbnail is None and post.image:
+        if cache.add(f'thumbnails:{post.id}', True, RETRY_TIMEOUT):
+            schedule_thumbnails(post)
+    return thumbnail
+
+
+@register.simple_tag
+def post_image(post, alias):
+    """Атрибуты картинки поста для <picture> или None, если её нет.
+
+    Берёт записанные варианты картинки, пока их нет - готовую миниатюру,
+    а пока нет и её - исходную картинку.
+    """
+    image = get_image_sources(post)
+    if image:
+        return image
+    thumbnail = post_thumbnail(post, alias)
+    if thumbnail is not None:
+        return {'src': thumbnail.url,
+                'width': thumbnail.width,
+                'height': thumbnail.height}
+    if post.image:
+        return {'src': post.image.url,
+                'width': post.image_width,
+                'height': post.image_height}
+    return None
+
+
+@register.simple_tag
+def card_timeout(post):
+    """Время жизни карточки поста в кэше фрагментов.
+
+    Карточка с готовыми вариантами картинки или без картинки хранится,
+    пока её не сбросит версия, а с миниатюрой или исходником - недолго.
+    """
+    if post.image and not post.image_variants:
+        return RETRY_TIMEOUT
+    return None
@@ -0,0 +1,110 @@
+from datetime import datetime, timezone
+
+from django.contrib.admin import ACTION_CHECKBOX_NAME
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import AuthorStats, Comment, Group, Post
+
+User = get_user_model()
+
+
+class PostAdminTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin')
+        cls.author = User.objects.create_user(username='author')
+        cls.groups = [Group.objects.create(title=f'Группа {num}',
+                                           slug=f'group-{num}',
+                                           description='')
+                      for num in range(3)]
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+        self.posts = [Post.objects.create(author=self.author,
+                                          text=f'Пост {num}',
+                                          group=self.groups[num % 3])
+                      for num in range(6)]
+        self.url = reverse('admin:posts_post_changelist')
+
+    def action(self, action, posts, **data):
+        return self.client.post(self.url, {
+            'action': action,
+            ACTION_CHECKBOX_NAME: [post.pk for post in posts],
+            **data})
+
+    def test_changelist_queries_do_not_grow(self):
+        """Список постов не делает запросов на каждую строку"""
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(self.url)
+        for num in range(10):
+            Post.objects.create(author=self.author, text=f'Ещё {num}',
+                                group=self.groups[0])
+        with CaptureQueriesContext(connection) as after:
+            self.client.get(self.url)
+        self.assertEqual(len(after), len(before))
+        self.assertFalse(any('COUNT(' in query['sql']
+                             for query in after.captured_queries))
+
+    def test_changelist_queries_use_indexes(self):
+        """Запросы списка постов не сортируют и не группируют всю таблицу"""
+        if connection.vendor != 'sqlite':
+            self.skipTest('Планы запросов проверяются в SQLite')
+        year = self.posts[0].pub_date.year
+        with CaptureQueriesContext(connection) as captured:
+            self.client.get(self.url)
+            self.client.get(self.url, {'pub_date__year': year})
+            self.client.get(self.url, {'pub_date__year': year,
+                                       'pub_date__month': 1})
+        with connection.cursor() as cursor:
+            for query in captured.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT') or 'posts_post' not in sql:
+                    continue
+                self.assertNotIn('django_date_trunc', sql)
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = ' '.join(row[-1] for row in cursor.fetchall())
+                self.assertNotIn('TEMP B-TREE', plan, sql)
+
+    def test_date_hierarchy_lists_periods_with_posts(self):
+        """Иерархия дат показывает только годы и месяцы с постами"""
+        Post.objects.filter(pk=self.posts[0].pk).update(
+            pub_date=datetime(2019, 5, 3, tzinfo=timezone.utc))
+        Post.objects.filter(pk=self.posts[1].pk).update(
+            pub_date=datetime(2017, 2, 1, tzinfo=timezone.utc))
+        response = self.client.get(self.url)
+        for year in (2017, 2019, self.posts[2].pub_date.year):
+            self.assertContains(response, f'?pub_date__year={year}"')
+        self.assertNotContains(response, '?pub_date__year=2018"')
+        response = self.client.get(self.url, {'pub_date__year': 2019})
+        self.assertContains(response,
+                            '?pub_date__month=5&amp;pub_date__year=2019"')
+        self.assertNotContains(response, 'pub_date__month=4')
+        self.assertEqual(list(response.context['cl'].result_list),
+                         [self.posts[0]])
+
+    def test_move_to_group_action(self):
+        """Действие переносит посты в группу"""
+        self.action('move_to_group', self.posts[:2],
+                    group=self.groups[2].pk)
+        self.assertEqual(
+            Post.objects.filter(group=self.groups[2]).count(), 4)
+
+    def test_delete_posts_action(self):
+        """Действие удаляет посты после подтверждения"""
+        Comment.objects.create(post=self.posts[0], author=self.author,
+                               text='Комментарий')
+        response = self.action('delete_posts', self.posts[:2])
+        self.assertContains(response, 'Будет удалено постов: 2')
+        self.assertEqual(Post.objects.count(), 6)
+        self.action('delete_posts', self.posts[:2], post='yes')
+        self.assertEqual(Post.objects.count(), 4)
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(AuthorStats.get_for(self.author).posts_count, 4)
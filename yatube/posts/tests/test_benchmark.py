@@ -0,0 +1,90 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection
+from django.test import TestCase, TransactionTestCase
+
+from posts.models import AuthorStats, Comment, Follow, Post, Timeline
+
+
+class BenchmarkTests(TestCase):
+    def setUp(self):
+        call_command('seed_benchmark', '--users=20', '--groups=3',
+                     '--posts=200', '--comments=100', '--follows=3',
+                     stdout=StringIO())
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.baseline = os.path.join(directory.name, 'baseline.json')
+
+    def benchmark(self, *args):
+        out = StringIO()
+        call_command('benchmark_views', '--requests=2',
+                     f'--baseline={self.baseline}', *args, stdout=out)
+        return out.getvalue()
+
+    def test_seed_builds_related_data(self):
+        """Сид создаёт посты, комментарии, подписки и ленты"""
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 100)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(Timeline.objects.exists())
+
+    def test_results_are_compared_with_baseline(self):
+        """Замеры сохраняются и сравниваются с базовыми"""
+        output = self.benchmark('--save')
+        for name in ('index', 'group_posts', 'profile', 'post_detail',
+                     'follow_index'):
+            self.assertIn(f'{name}:cold', output)
+        self.assertIn('Регрессий нет', self.benchmark('--tolerance=1000'))
+
+    def test_extra_queries_are_a_regression(self):
+        """Лишние запросы к базе считаются регрессией"""
+        self.benchmark('--save')
+        with open(self.baseline) as file_:
+            baseline = json.load(file_)
+        baseline['results']['index:cold']['queries'] = 0
+        with open(self.baseline, 'w') as file_:
+            json.dump(baseline, file_)
+        with self.assertRaises(CommandError):
+            self.benchmark('--tolerance=1000')
+
+    def test_shared_cache_is_left_alone(self):
+        """Холодные замеры не очищают кэш сайта"""
+        cache.set('benchmark_test', 'kept')
+        self.benchmark()
+        self.assertEqual(cache.get('benchmark_test'), 'kept')
+
+    def test_missing_author_stats(self):
+        """Без счётчиков авторов команда объясняет, что делать"""
+        AuthorStats.objects.all().delete()
+        with self.assertRaisesMessage(CommandError, 'reconcile_counters'):
+            self.benchmark()
+
+
+class FeedQueryPlansTests(TransactionTestCase):
+    def run_plans(self):
+        out = StringIO()
+        call_command('feed_query_plans', '--seed=200', stdout=out,
+                     stderr=out)
+        return out.getvalue()
+
+    def test_plans_without_and_with_indexes(self):
+        """Планы «до» снимаются без индексов и ограничения подписок,
+        а повторный запуск не создаёт данные заново"""
+        before, after = self.run_plans().split('После: с индексами')
+        self.assertIn('follow exists', before)
+        if connection.vendor == 'sqlite':
+            self.assertNotIn('sqlite_autoindex_posts_follow', before)
+            self.assertIn('sqlite_autoindex_posts_follow', after)
+        posts_count = Post.objects.count()
+        self.assertIn('Данные для замеров уже есть', self.run_plans())
+        self.assertEqual(Post.objects.count(), posts_count)
+        follow = Follow.objects.first()
+        with self.assertRaises(IntegrityError):
+            Follow.objects.create(user_id=follow.user_id,
+                                  author_id=follow.author_id)
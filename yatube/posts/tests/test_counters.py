@@ -0,0 +1,73 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import AuthorStats, Comment, Follow, Post
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author,
+                                       text='Тестовый пост')
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_counters_follow_writes(self):
+        """Счётчики меняются при записи постов, комментариев и подписок"""
+        Comment.objects.create(post=self.post, author=self.reader,
+                               text='Комментарий')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        author_stats = AuthorStats.objects.get(user=self.author)
+        self.assertEqual(author_stats.posts_count, 1)
+        self.assertEqual(author_stats.followers_count, 1)
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.reader).following_count, 1)
+        follow.delete()
+        Post.objects.create(author=self.author, text='Удаляемый').delete()
+        author_stats.refresh_from_db()
+        self.assertEqual(author_stats.posts_count, 1)
+        self.assertEqual(author_stats.followers_count, 0)
+
+    def test_reconcile_counters_repairs_drift(self):
+        """Команда reconcile_counters исправляет расхождения"""
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост {num}') for num in range(3))
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.reader, text='Комментарий')
+            for _ in range(2))
+        AuthorStats.objects.filter(user=self.reader).delete()
+        call_command('reconcile_counters', batch_size=1, stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 2)
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.author).posts_count, 4)
+        self.assertTrue(AuthorStats.objects.filter(user=self.reader).exists())
+
+    def test_pages_read_counters_without_aggregates(self):
+        """Профиль и страница поста не считают посты агрегатами"""
+        urls = (reverse('posts:profile',
+                        kwargs={'username': self.author.username}),
+                reverse('posts:post_detail',
+                        kwargs={'post_id': self.post.id}))
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.reader_client.get(url)
+                self.assertEqual(response.context['posts_count'], 1)
+                for query in queries.captured_queries:
+                    self.assertNotIn('COUNT(', query['sql'])
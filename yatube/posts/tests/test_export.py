@@ -0,0 +1,72 @@
+import json
+import shutil
+import tempfile
+import zipfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+User = get_user_model()
+SMALL_GIF = (b'\x47\x49\x46\x38\x39\x61\x02\x00'
+             b'\x01\x00\x80\x00\x00\x00\x00\x00'
+             b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+             b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+             b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+             b'\x0A\x00\x3B')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.author)
+        self.url = reverse('posts:profile_export',
+                           kwargs={'username': 'author'})
+
+    def test_archive_has_posts_comments_and_images(self):
+        """Архив содержит посты, комментарии и исходные картинки"""
+        image = SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif')
+        post = Post.objects.create(author=self.author, text='С картинкой',
+                                   image=image)
+        Post.objects.create(author=self.author, text='Без картинки')
+        Post.objects.create(author=self.reader, text='Чужой пост')
+        Comment.objects.create(post=post, author=self.author,
+                               text='Комментарий')
+        response = self.client.get(self.url)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        archive = zipfile.ZipFile(BytesIO(b''.join(
+            response.streaming_content)))
+        posts = [json.loads(line)
+                 for line in archive.read('posts.jsonl').splitlines()]
+        self.assertEqual([item['text'] for item in posts],
+                         ['С картинкой', 'Без картинки'])
+        self.assertEqual(archive.read(posts[0]['image']), SMALL_GIF)
+        self.assertIsNone(posts[1]['image'])
+        comments = archive.read('comments.jsonl').splitlines()
+        self.assertEqual(json.loads(comments[0])['text'], 'Комментарий')
+
+    def test_only_author_can_export(self):
+        """Чужой архив скачать нельзя"""
+        self.client.force_login(self.reader)
+        response = self.client.get(self.url)
+        self.assertRedirects(response, reverse(
+            'posts:profile', kwargs={'username': 'author'}))
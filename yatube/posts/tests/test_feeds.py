@@ -0,0 +1,74 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class FeedsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Кошки', slug='cats',
+                                         description='Про кошек')
+        cls.other_group = Group.objects.create(title='Собаки', slug='dogs',
+                                               description='Про собак')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.post = Post.objects.create(author=self.author, group=self.group,
+                                        text='Кошка спит на диване')
+
+    def test_feeds_list_latest_posts(self):
+        """RSS и Atom сайта, группы и автора выводят последние посты"""
+        urls = (
+            reverse('posts:posts_rss'),
+            reverse('posts:posts_atom'),
+            reverse('posts:group_rss', kwargs={'slug': 'cats'}),
+            reverse('posts:group_atom', kwargs={'slug': 'cats'}),
+            reverse('posts:author_rss', kwargs={'username': 'author'}),
+            reverse('posts:author_atom', kwargs={'username': 'author'}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertContains(response, 'Кошка спит на диване')
+                self.assertContains(response, reverse(
+                    'posts:post_detail', kwargs={'post_id': self.post.id}))
+
+    def test_missing_group_feed(self):
+        """Лента несуществующей группы отдаёт 404"""
+        response = self.client.get(reverse('posts:group_rss',
+                                           kwargs={'slug': 'missing'}))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_unchanged_feed_costs_no_queries(self):
+        """Повторный опрос без изменений получает 304 без запросов к базе"""
+        url = reverse('posts:group_rss', kwargs={'slug': 'cats'})
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+    def test_feed_changes_only_with_its_posts(self):
+        """Ленту группы сбрасывают только посты этой группы"""
+        url = reverse('posts:group_rss', kwargs={'slug': 'cats'})
+        etag = self.client.get(url)['ETag']
+        Post.objects.create(author=self.author, group=self.other_group,
+                            text='Собака гуляет')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        Post.objects.create(author=self.author, group=self.group,
+                            text='Кошка проснулась')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Кошка проснулась')
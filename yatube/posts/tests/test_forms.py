@@ -1,18 +1,34 @@
+import hashlib
 import shutil
 import tempfile
+from http import HTTPStatus
+from io import BytesIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import SkipFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
+from posts.forms import PostForm
+from posts.images import ImageUploadHandler
 from posts.models import Group, Post
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 User = get_user_model()
 
 
+def make_jpeg(width, height, exif=None):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), 'red').save(
+        buffer, 'JPEG', exif=exif or b'')
+    return SimpleUploadedFile(name='photo.jpg',
+                              content=buffer.getvalue(),
+                              content_type='image/jpeg')
+
+
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class PostFormTests(TestCase):
     @classmethod
@@ -92,6 +108,111 @@ class PostFormTests(TestCase):
                                 data=form_data,
                                 follow=True)
         self.assertEqual(posts_count_before + 1, Post.objects.count())
-        self.assertTrue(Post.objects.filter(text=form_data['text'],
-                                            group=form_data['group'],
-                                            image='posts/small.jpg').exists())
+        digest = hashlib.sha256(small_img).hexdigest()
+        self.assertTrue(Post.objects.filter(
+            text=form_data['text'],
+            group=form_data['group'],
+            image=f'posts/{digest[:2]}/{digest[2:4]}/{digest}.jpg').exists())
+
+    def test_post_with_img_stores_size_and_placeholder(self):
+        """ Форма записывает размеры картинки и её превью """
+        small_img = (b'\x47\x49\x46\x38\x39\x61\x02\x00'
+                     b'\x01\x00\x80\x00\x00\x00\x00\x00'
+                     b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+                     b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+                     b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+                     b'\x0A\x00\x3B')
+        uploaded = SimpleUploadedFile(name='sized.gif',
+                                      content=small_img,
+                                      content_type='image/gif')
+        self.author_client.post(reverse('posts:post_create'),
+                                data={'text': 'Пост с размерами',
+                                      'image': uploaded})
+        post = Post.objects.get(text='Пост с размерами')
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        self.assertTrue(
+            post.image_placeholder.startswith('data:image/jpeg;base64,'))
+        response = self.author_client.get(
+            reverse('posts:profile', kwargs={'username': 'author'}))
+        self.assertContains(response, 'width="2" height="1"')
+        self.assertContains(response, 'loading="lazy"')
+
+    def test_large_img_is_downscaled_without_exif(self):
+        """ Большая картинка уменьшается, а EXIF из неё удаляется """
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        form = PostForm(data={'text': 'Большая картинка'},
+                        files={'image': make_jpeg(3000, 100,
+                                                  exif.tobytes())})
+        self.assertTrue(form.is_valid(), form.errors)
+        form.instance.author = self.author
+        post = form.save()
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (settings.IMAGE_MAX_SIDE, 85))
+            self.assertFalse(image.getexif())
+        self.assertEqual(post.image_width, settings.IMAGE_MAX_SIDE)
+
+    @override_settings(IMAGE_MAX_PIXELS=100)
+    def test_img_with_too_many_pixels_is_rejected(self):
+        """ Картинка со слишком большим числом пикселей не принимается """
+        form = PostForm(data={'text': 'Огромная картинка'},
+                        files={'image': make_jpeg(20, 20)})
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'too_many_pixels')
+
+    @override_settings(IMAGE_MAX_UPLOAD_SIZE=10)
+    def test_too_large_file_is_rejected(self):
+        """ Слишком большой файл не принимается """
+        form = PostForm(data={'text': 'Тяжёлая картинка'},
+                        files={'image': make_jpeg(20, 20)})
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'file_too_large')
+
+    @override_settings(IMAGE_MAX_UPLOAD_SIZE=100)
+    def test_upload_is_cut_off_past_size_limit(self):
+        """ Загрузка обрывается на блоке, перешедшем предел размера """
+        handler = ImageUploadHandler()
+        handler.new_file('image', 'photo.jpg', 'image/jpeg', None)
+        header = make_jpeg(20, 20).read()
+        with self.assertRaises(SkipFile):
+            handler.receive_data_chunk(header, 0)
+        self.assertEqual(handler.rejected[0].error.code, 'file_too_large')
+
+    def test_upload_header_is_checked_from_first_chunks(self):
+        """ Неподдерживаемый формат виден по первым блокам загрузки """
+        buffer = BytesIO()
+        Image.new('RGB', (20, 20)).save(buffer, 'BMP')
+        handler = ImageUploadHandler()
+        handler.new_file('image', 'picture.bmp', 'image/bmp', None)
+        with self.assertRaises(SkipFile):
+            handler.receive_data_chunk(buffer.getvalue()[:64], 0)
+        self.assertEqual(handler.rejected[0].error.code, 'invalid_format')
+        jpeg = make_jpeg(20, 20).read()
+        handler.new_file('image', 'photo.jpg', 'image/jpeg', None)
+        for start in range(0, len(jpeg), 64):
+            chunk = jpeg[start:start + 64]
+            self.assertEqual(handler.receive_data_chunk(chunk, start), chunk)
+        self.assertTrue(handler.checked)
+
+    @override_settings(IMAGE_MAX_UPLOAD_SIZE=100)
+    def test_rejected_upload_is_shown_in_form(self):
+        """ Оборванная загрузка даёт ошибку поля, пост не создаётся """
+        response = self.author_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Тяжёлая картинка', 'image': make_jpeg(20, 20)})
+        self.assertEqual(
+            response.context['form'].errors.as_data()['image'][0].code,
+            'file_too_large')
+        self.assertFalse(Post.objects.filter(
+            text='Тяжёлая картинка').exists())
+
+    @override_settings(CSRF_FAILURE_VIEW='django.views.csrf.csrf_failure')
+    def test_post_create_still_checks_csrf(self):
+        """ Проверка CSRF остаётся после установки обработчика загрузки """
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.author)
+        response = client.post(reverse('posts:post_create'),
+                               data={'text': 'Без токена'})
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
@@ -0,0 +1,118 @@
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts import search
+from posts.management.commands.import_posts import Command
+from posts.models import (AuthorStats, Follow, Group, ImportState, Post,
+                          Timeline)
+
+User = get_user_model()
+
+
+class ImportPostsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='')
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w', encoding='utf-8') as file_:
+            file_.write(content)
+        return path
+
+    def write_jsonl(self, records):
+        return self.write('posts.jsonl', ''.join(
+            json.dumps(record, ensure_ascii=False) + '\n'
+            for record in records))
+
+    def run_import(self, path, *args):
+        out = StringIO()
+        call_command('import_posts', path, *args, stdout=out)
+        return out.getvalue()
+
+    def test_posts_are_imported_with_their_data(self):
+        """Посты импортируются с датой, группой, индексом и счётчиками"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        path = self.write_jsonl([
+            {'text': 'Старый пост про кошек', 'author': 'author',
+             'group': 'group', 'pub_date': '2015-03-01T10:00:00Z'},
+            {'text': 'Пост без автора', 'author': 'nobody'},
+            'не объект',
+            {'text': 'Пост поновее', 'author': 'author',
+             'pub_date': '2016-05-02T10:00:00Z'},
+        ])
+        output = self.run_import(path, '--batch-size=4')
+        self.assertIn('пропущено: 2', output)
+        self.assertEqual(
+            Post.objects.get(text='Пост поновее').pub_date,
+            datetime(2016, 5, 2, 10, tzinfo=timezone.utc))
+        post = Post.objects.get(group=self.group)
+        self.assertEqual(post.pub_date,
+                         datetime(2015, 3, 1, 10, tzinfo=timezone.utc))
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.author).posts_count, 2)
+        self.assertTrue(Timeline.objects.filter(user=self.reader,
+                                                post=post).exists())
+        if search.is_available():
+            self.assertEqual(list(search.matching(Post.objects, 'кошек')),
+                             [post])
+
+    def test_import_resumes_from_state(self):
+        """Повторный запуск продолжает с первой необработанной записи"""
+        path = self.write_jsonl([{'text': f'Пост {num}', 'author': 'author'}
+                                 for num in range(5)])
+        ImportState.objects.create(source=path, position=3)
+        self.run_import(path, '--batch-size=1')
+        self.assertEqual(sorted(Post.objects.values_list('text', flat=True)),
+                         ['Пост 3', 'Пост 4'])
+        self.run_import(path)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(ImportState.objects.get(source=path).position, 5)
+
+    def test_failed_chunk_is_rolled_back_with_state(self):
+        """Пачка, на которой импорт упал, не остаётся в базе без состояния"""
+        path = self.write_jsonl([{'text': f'Пост {num}', 'author': 'author'}
+                                 for num in range(4)])
+        calls = []
+
+        def write_state(command, done):
+            calls.append(done)
+            if len(calls) == 2:
+                raise RuntimeError('сбой')
+            original(command, done)
+
+        original = Command.write_state
+        with mock.patch.object(Command, 'write_state', write_state):
+            with self.assertRaises(RuntimeError):
+                self.run_import(path, '--batch-size=2')
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(ImportState.objects.get(source=path).position, 2)
+        self.run_import(path, '--batch-size=2')
+        self.assertEqual(sorted(Post.objects.values_list('text', flat=True)),
+                         [f'Пост {num}' for num in range(4)])
+
+    def test_csv_creates_missing_authors(self):
+        """Из CSV можно импортировать посты новых авторов"""
+        path = self.write('posts.csv', 'text,author,group,pub_date\n'
+                                       'Первый,newcomer,,\n')
+        self.run_import(path, '--create-authors')
+        post = Post.objects.get()
+        self.assertEqual(post.author.username, 'newcomer')
+        self.assertFalse(post.author.has_usable_password())
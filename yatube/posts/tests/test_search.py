@@ -0,0 +1,73 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import search
+from posts.models import Post
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin')
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.cat = Post.objects.create(author=self.author,
+                                       text='Кошки спят на подоконнике')
+        self.dog = Post.objects.create(author=self.author,
+                                       text='Собаки гуляют, кошки спят')
+
+    def found(self, query, **params):
+        response = self.guest_client.get(reverse('posts:search'),
+                                         {'q': query, **params})
+        return response.context['page_obj']
+
+    def test_search_finds_words_and_prefixes(self):
+        """Поиск находит посты по словам и началу последнего слова"""
+        self.assertEqual(set(self.found('кошки спят')), {self.cat, self.dog})
+        self.assertEqual(list(self.found('соба')), [self.dog])
+        self.assertEqual(list(self.found('"OR :*')), [])
+
+    def test_index_follows_edits_and_deletes(self):
+        """Индекс обновляется при изменении и удалении поста"""
+        self.dog.text = 'Собаки гуляют'
+        self.dog.save()
+        self.assertEqual(list(self.found('кошки')), [self.cat])
+        self.cat.delete()
+        self.assertEqual(list(self.found('кошки')), [])
+
+    @override_settings(POST_PER_PAGE=1)
+    def test_search_is_paginated_by_cursor(self):
+        """Результаты поиска листаются курсором"""
+        first = self.found('кошки')
+        self.assertTrue(first.has_next())
+        second = self.found('кошки', after=first.next_cursor)
+        self.assertFalse(second.has_next())
+        self.assertEqual({*first, *second}, {self.cat, self.dog})
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт по индексу"""
+        client = Client()
+        client.force_login(self.admin)
+        response = client.get(reverse('admin:posts_post_changelist'),
+                              {'q': 'собаки'})
+        self.assertEqual(list(response.context['cl'].result_list),
+                         [self.dog])
+
+    def test_rebuild_search_index_command(self):
+        """Команда заново строит индекс по всем постам"""
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.FTS_TABLE}')
+        self.assertEqual(list(self.found('собаки')), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(list(self.found('собаки')), [self.dog])
@@ -0,0 +1,270 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from time import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.management import call_command
+from django.template.loader import render_to_string
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from sorl.thumbnail import default
+from sorl.thumbnail.kvstores.base import KVStoreBase
+from sorl.thumbnail.models import KVStore
+
+from core.storage import is_hashed_name
+from posts.management.commands.collect_orphaned_media import (
+    Command as CollectCommand)
+from posts.models import Post
+from posts.templatetags.post_images import RETRY_TIMEOUT
+from posts.thumbnails import (build_thumbnails, get_built_thumbnail,
+                              get_image_sources, prefetch_thumbnails)
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+User = get_user_model()
+SMALL_GIF = (b'\x47\x49\x46\x38\x39\x61\x02\x00'
+             b'\x01\x00\x80\x00\x00\x00\x00\x00'
+             b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+             b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+             b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+             b'\x0A\x00\x3B')
+
+
+class MemoryKVStore(KVStoreBase):
+    """Хранилище ключей sorl-thumbnail не в базе, как Redis."""
+
+    def __init__(self):
+        super().__init__()
+        self.data = {}
+
+    def _get_raw(self, key):
+        return self.data.get(key)
+
+    def _set_raw(self, key, value):
+        self.data[key] = value
+
+    def _delete_raw(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def _find_keys_raw(self, prefix):
+        return [key for key in self.data if key.startswith(prefix)]
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        # Одинаковые картинки хранятся одним файлом, поэтому миниатюры
+        # прошлых тестов нужно забыть
+        cache.clear()
+        self.post = Post.objects.create(
+            author=self.author,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(name='small.gif',
+                                     content=SMALL_GIF,
+                                     content_type='image/gif'))
+
+    def test_thumbnail_is_read_only_after_build(self):
+        """Шаблон выводит миниатюру только после её построения"""
+        self.assertIsNone(get_built_thumbnail(self.post.image, 'card'))
+        response = Client().get(reverse('posts:post_detail',
+                                        kwargs={'post_id': self.post.id}))
+        self.assertContains(response, self.post.image.url)
+        build_thumbnails(self.post.id, self.post.image.name)
+        thumbnail = get_built_thumbnail(self.post.image, 'card')
+        self.assertIsNotNone(thumbnail)
+        response = Client().get(reverse('posts:post_detail',
+                                        kwargs={'post_id': self.post.id}))
+        self.assertContains(response, thumbnail.url)
+
+    def test_card_without_variants_expires(self):
+        """Карточка без вариантов картинки недолго живёт в кэше, чтобы
+        потерянная сборка миниатюр не оставила в ней исходник навсегда"""
+        context = {'post': self.post, 'show_author': False}
+        html = render_to_string('posts/includes/post_card.html', context)
+        self.assertIn(self.post.image.url, html)
+        build_thumbnails(self.post.id, self.post.image.name)
+        self.post.refresh_from_db()
+        context['post'] = self.post
+        self.assertEqual(
+            render_to_string('posts/includes/post_card.html', context), html)
+        later = time() + RETRY_TIMEOUT + 1
+        with mock.patch('django.core.cache.backends.locmem.time.time',
+                        return_value=later):
+            html = render_to_string('posts/includes/post_card.html',
+                                    context)
+        self.assertIn(get_image_sources(self.post)['src'], html)
+
+    def test_variants_are_recorded_and_rendered(self):
+        """Варианты картинки записываются в пост и выводятся в srcset"""
+        build_thumbnails(self.post.id, self.post.image.name)
+        self.post.refresh_from_db()
+        sources = get_image_sources(self.post)
+        self.assertEqual([source['type'] for source in sources['sources']],
+                         ['image/webp', 'image/jpeg'])
+        self.assertIn('.webp 320w', sources['sources'][0]['srcset'])
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, 'srcset="' + sources['sources'][0][
+            'srcset'])
+        self.assertContains(response, 'src="' + sources['src'])
+
+    def test_new_image_resets_variants(self):
+        """Новая картинка сбрасывает варианты старой"""
+        build_thumbnails(self.post.id, self.post.image.name)
+        client = Client()
+        client.force_login(self.author)
+        client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.id}),
+            {'text': 'Новая картинка',
+             'image': SimpleUploadedFile(name='other.gif',
+                                         content=SMALL_GIF,
+                                         content_type='image/gif')})
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.image_variants, '')
+
+    def test_build_thumbnails_command(self):
+        """Команда build_thumbnails строит миниатюры старых картинок"""
+        call_command('build_thumbnails', stdout=StringIO())
+        self.assertIsNotNone(get_built_thumbnail(self.post.image, 'card'))
+        self.post.refresh_from_db()
+        self.assertNotEqual(self.post.image_variants, '')
+
+    def test_prefetch_thumbnails_uses_one_lookup(self):
+        """Миниатюры страницы читаются из кэша без запросов к базе"""
+        posts = [self.post]
+        for num in range(2):
+            posts.append(Post.objects.create(
+                author=self.author, text=f'Пост {num}',
+                image=SimpleUploadedFile(name=f'small_{num}.gif',
+                                         content=SMALL_GIF,
+                                         content_type='image/gif')))
+        for post in posts:
+            build_thumbnails(post.id, post.image.name)
+        with self.assertNumQueries(0):
+            thumbnails = prefetch_thumbnails(posts, 'card')
+        for post in posts:
+            self.assertEqual(thumbnails[post.id].url,
+                             get_built_thumbnail(post.image, 'card').url)
+
+    def test_prefetch_thumbnails_falls_back_on_miss(self):
+        """Если в кэше нет ключа, миниатюра читается по одной"""
+        build_thumbnails(self.post.id, self.post.image.name)
+        cache.clear()
+        thumbnails = prefetch_thumbnails([self.post], 'card')
+        self.assertEqual(thumbnails[self.post.id].url,
+                         get_built_thumbnail(self.post.image, 'card').url)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ShardedImagesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, name):
+        return Post.objects.create(
+            author=self.author,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(name=name,
+                                     content=SMALL_GIF,
+                                     content_type='image/gif'))
+
+    def test_identical_images_are_stored_once(self):
+        """Одинаковые картинки хранятся одним файлом по хэшу"""
+        first = self.create_post('first.gif')
+        second = self.create_post('second.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(is_hashed_name(first.image.name))
+
+    def test_shard_post_images_command(self):
+        """Команда переносит старые картинки в раскладку по хэшу"""
+        storage = Post._meta.get_field('image').storage
+        FileSystemStorage(location=storage.location).save(
+            'posts/old.gif', ContentFile(SMALL_GIF))
+        post = self.create_post('new.gif')
+        Post.objects.filter(pk=post.pk).update(image='posts/old.gif')
+        cache.clear()
+        client = Client()
+        self.assertContains(client.get(reverse('posts:index')),
+                            storage.url('posts/old.gif'))
+        call_command('shard_post_images', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertTrue(is_hashed_name(post.image.name))
+        self.assertTrue(storage.exists(post.image.name))
+        self.assertFalse(storage.exists('posts/old.gif'))
+        response = client.get(reverse('posts:index'))
+        self.assertContains(response, post.image.url)
+        self.assertNotContains(response, storage.url('posts/old.gif'))
+
+    @override_settings(MEDIA_ROOT=os.path.join(TEMP_MEDIA_ROOT, 'gc'))
+    def test_collect_orphaned_media_command(self):
+        """Команда удаляет картинки без постов и лишние миниатюры"""
+        storage = Post._meta.get_field('image').storage
+        post = self.create_post('kept.gif')
+        build_thumbnails(post.id, post.image.name)
+        thumbnail = get_built_thumbnail(post.image, 'card')
+        orphan = storage.save('posts/orphan.gif', ContentFile(b'orphan'))
+        stray = storage.save('cache/stray.jpg', ContentFile(b'stray'))
+        out = StringIO()
+        call_command('collect_orphaned_media', '--dry-run', '--min-age=0',
+                     stdout=out)
+        self.assertIn('Будет удалено файлов: 2', out.getvalue())
+        self.assertTrue(storage.exists(orphan))
+        call_command('collect_orphaned_media', '--min-age=0', '--sleep=0',
+                     stdout=StringIO())
+        self.assertFalse(storage.exists(orphan))
+        self.assertFalse(storage.exists(stray))
+        self.assertTrue(storage.exists(post.image.name))
+        self.assertTrue(storage.exists(thumbnail.name))
+
+    @override_settings(MEDIA_ROOT=os.path.join(TEMP_MEDIA_ROOT, 'kvstore'))
+    def test_collector_asks_configured_kvstore(self):
+        """Миниатюры из хранилища ключей не в базе тоже не удаляются"""
+        with mock.patch.object(default, 'kvstore', MemoryKVStore()):
+            post = self.create_post('redis.gif')
+            build_thumbnails(post.id, post.image.name)
+            thumbnail = get_built_thumbnail(post.image, 'card')
+            self.assertFalse(KVStore.objects.exists())
+            call_command('collect_orphaned_media', '--min-age=0',
+                         '--sleep=0', stdout=StringIO())
+        self.assertTrue(default.storage.exists(thumbnail.name))
+
+    @override_settings(MEDIA_ROOT=os.path.join(TEMP_MEDIA_ROOT, 'reuse'))
+    def test_reused_image_is_not_collected(self):
+        """Старый файл, снова загруженный в пост, не удаляется"""
+        storage = Post._meta.get_field('image').storage
+        name = storage.save('posts/reused.gif', ContentFile(SMALL_GIF))
+        old_time = time() - 2 * 60 * 60
+        os.utime(storage.path(name), (old_time, old_time))
+        post = self.create_post('again.gif')
+        self.assertEqual(post.image.name, name)
+        self.assertGreater(os.path.getmtime(storage.path(name)), old_time)
+        command = CollectCommand()
+        # Пачка проверялась до появления поста
+        command.modified_before = time() + 60
+        self.assertTrue(storage.exists(name))
+        self.assertFalse(command.delete_image(name))
+        self.assertTrue(storage.exists(name))
@@ -0,0 +1,130 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import timeline
+from posts.models import AuthorStats, Follow, Post, Timeline
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author,
+                                       text='Старый пост автора')
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def follow(self):
+        self.reader_client.get(reverse('posts:profile_follow',
+                                       kwargs={'username':
+                                               self.author.username}))
+
+    def feed(self):
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_and_unfollow_prunes_timeline(self):
+        """Подписка заполняет ленту, отписка очищает её"""
+        self.follow()
+        self.assertTrue(Timeline.objects.filter(user=self.reader,
+                                                post=self.post).exists())
+        self.assertEqual(self.feed(), [self.post])
+        self.reader_client.get(reverse('posts:profile_unfollow',
+                                       kwargs={'username':
+                                               self.author.username}))
+        self.assertFalse(Timeline.objects.filter(user=self.reader).exists())
+        self.assertEqual(self.feed(), [])
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        """Новый пост попадает в ленты подписчиков"""
+        self.follow()
+        self.author_client.post(reverse('posts:post_create'),
+                                data={'text': 'Новый пост автора'})
+        new_post = Post.objects.get(text='Новый пост автора')
+        self.assertTrue(Timeline.objects.filter(user=self.reader,
+                                                post=new_post).exists())
+        self.assertEqual(self.feed(), [new_post, self.post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1, TIMELINE_FANOUT_LOW=1,
+                       TIMELINE_COOL_DOWN_ROWS=1)
+    def test_cooled_author_posts_stay_in_feed(self):
+        """Посты, написанные «звездой», остаются в ленте после отписок"""
+        other = User.objects.create_user(username='other')
+        self.follow()
+        Follow.objects.create(user=other, author=self.author)
+        self.author_client.post(reverse('posts:post_create'),
+                                data={'text': 'hot era post'})
+        hot_post = Post.objects.get(text='hot era post')
+        self.assertFalse(Timeline.objects.filter(post=hot_post).exists())
+        self.assertEqual(self.feed(), [hot_post, self.post])
+        Follow.objects.filter(user=other).delete()
+        # Пока фон не разложил посты, они читаются из таблицы постов
+        self.assertTrue(AuthorStats.objects.get(user=self.author).cooling)
+        self.assertEqual(self.feed(), [hot_post, self.post])
+        self.assertTrue(timeline.cool_down(self.author.id))
+        stats = AuthorStats.objects.get(user=self.author)
+        self.assertFalse(stats.hot or stats.cooling)
+        self.assertTrue(Timeline.objects.filter(user=self.reader,
+                                                post=hot_post).exists())
+        self.assertEqual(self.feed(), [hot_post, self.post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2, TIMELINE_FANOUT_LOW=1)
+    def test_unfollow_above_low_water_mark_keeps_author_hot(self):
+        """Отписка до числа между порогами не запускает раскладку"""
+        readers = [User.objects.create_user(username=f'reader{num}')
+                   for num in range(3)]
+        for reader in readers:
+            Follow.objects.create(user=reader, author=self.author)
+        Follow.objects.filter(user=readers[0]).delete()
+        stats = AuthorStats.objects.get(user=self.author)
+        self.assertTrue(stats.hot)
+        self.assertFalse(stats.cooling)
+        Follow.objects.create(user=readers[0], author=self.author)
+        Follow.objects.filter(user__in=readers[:2]).delete()
+        self.assertTrue(AuthorStats.objects.get(user=self.author).cooling)
+        # Подписка во время раскладки снова делает автора «звездой»
+        Follow.objects.create(user=readers[0], author=self.author)
+        Follow.objects.create(user=readers[1], author=self.author)
+        self.assertFalse(AuthorStats.objects.get(user=self.author).cooling)
+        self.assertFalse(timeline.cool_down(self.author.id))
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0, TIMELINE_FANOUT_LOW=0)
+    def test_rebuild_timelines_finishes_cool_downs(self):
+        """rebuild_timelines доводит до конца потерянные раскладки"""
+        self.follow()
+        hot_post = Post.objects.create(author=self.author, text='Пост звезды')
+        AuthorStats.objects.filter(user=self.author).update(
+            followers_count=0, cooling=True)
+        call_command('rebuild_timelines', 'nobody', stdout=StringIO())
+        self.assertFalse(AuthorStats.objects.get(user=self.author).hot)
+        self.assertTrue(Timeline.objects.filter(user=self.reader,
+                                                post=hot_post).exists())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_hot_author_posts_are_read_on_request(self):
+        """Посты «звёзд» не раскладываются, но видны в ленте"""
+        self.follow()
+        self.author_client.post(reverse('posts:post_create'),
+                                data={'text': 'Пост звезды'})
+        self.assertFalse(Timeline.objects.exists())
+        new_post = Post.objects.get(text='Пост звезды')
+        self.assertEqual(self.feed(), [new_post, self.post])
+
+    def test_rebuild_timelines_command(self):
+        """Команда rebuild_timelines восстанавливает ленты"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        call_command('rebuild_timelines', self.reader.username,
+                     stdout=StringIO())
+        self.assertEqual(self.feed(), [self.post])
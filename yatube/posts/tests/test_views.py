@@ -1,15 +1,21 @@
 import shutil
 import tempfile
+from http import HTTPStatus
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from posts.models import Group, Post
+from core.cache import bump_version
+from posts import timeline, versions
+from posts.invalidation import bump_posts
+from posts.models import Comment, Follow, Group, Post
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 User = get_user_model()
@@ -181,6 +187,46 @@ class PostsPagesTests(TestCase):
                 with self.subTest():
                     self.assertEqual(len(page_obj_context), posts_count)
 
+    @override_settings(POST_PER_PAGE=1)
+    def test_paginator_elides_page_range(self):
+        """Пагинатор по номерам выводит не все страницы"""
+        Post.objects.bulk_create(Post(text=f'Пост № {post_num}',
+                                      author=self.author)
+                                 for post_num in range(30))
+        response = self.guest_client.get('/', {'page': 15})
+        self.assertContains(response, '…', count=2)
+        self.assertContains(response, '?page=14"')
+        self.assertNotContains(response, '?page=5"')
+
+    def test_cursor_paginator(self):
+        """Тестирование пагинатора по курсору"""
+        posts = [Post(text=f'Пост № {post_num}',
+                      author=self.author,
+                      group=self.group)
+                 for post_num in range(self.posts_num)]
+        Post.objects.bulk_create(posts)
+        urls_with_paginator = ('/',
+                               f'/group/{self.group.slug}/',
+                               f'/profile/{self.author.username}/')
+        for url_address in urls_with_paginator:
+            with self.subTest(url_address=url_address):
+                first_page = self.guest_client.get(
+                    url_address).context['page_obj']
+                self.assertEqual(len(first_page), 10)
+                self.assertFalse(first_page.has_previous())
+                second_page = self.guest_client.get(
+                    url_address,
+                    {'after': first_page.next_cursor}
+                ).context['page_obj']
+                self.assertEqual(len(second_page), 3)
+                self.assertFalse(second_page.has_next())
+                back_page = self.guest_client.get(
+                    url_address,
+                    {'before': second_page.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(list(back_page), list(first_page))
+                self.assertFalse(back_page.has_previous())
+
     def test_post_with_image(self):
         """Изображение передается в словаре context"""
         small_gif = (b'\x47\x49\x46\x38\x39\x61\x02\x00'
@@ -236,18 +282,241 @@ class PostsPagesTests(TestCase):
         response = self.user_client.get(reverse('posts:post_detail',
                                                 kwargs={'post_id':
                                                         self.post.id}))
-        comment = response.context['comments'].filter(text=comment_text)
-        self.assertTrue(comment.exists())
+        comments = [comment.text for comment in response.context['comments']]
+        self.assertIn(comment_text, comments)
+
+    def test_comments_are_paginated(self):
+        """Комментарии выводятся пачками и подгружаются фрагментом"""
+        Comment.objects.bulk_create(
+            Comment(post=self.post,
+                    author=self.user,
+                    text=f'Комментарий {num}')
+            for num in range(25))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.user_client.get(
+                reverse('posts:post_detail',
+                        kwargs={'post_id': self.post.id}))
+        first_batch = response.context['comments']
+        self.assertEqual(len(first_batch), 20)
+        self.assertLess(len(queries), 10)
+        response = self.user_client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.id}),
+            {'after': first_batch.next_cursor})
+        self.assertTemplateUsed(response, 'posts/includes/comment_list.html')
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            [f'Комментарий {num}' for num in range(20, 25)])
+
+    def test_comments_fragment_of_missing_post_is_not_found(self):
+        """Фрагмент комментариев несуществующего поста отдаёт 404"""
+        response = self.user_client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 0}))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_comments_fragment_requires_login(self):
+        """Гость, как и на странице поста, комментариев не получает"""
+        Comment.objects.create(post=self.post, author=self.user,
+                               text='Комментарий')
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.id})
+        response = self.guest_client.get(url)
+        self.assertRedirects(response, f'{reverse("users:login")}?next={url}')
 
     def test_cache_work_is_correct(self):
         """Тестирование кэширования"""
         post = Post.objects.create(author=self.author,
                                    group=self.group,
-                                   text='Этот пост будет удален')
-        after_create = self.guest_client.get(reverse('posts:index')).content
-        post.delete()
-        after_delete = self.guest_client.get(reverse('posts:index')).content
-        cache.clear()
-        after_clear = self.guest_client.get(reverse('posts:index')).content
-        self.assertEqual(after_create, after_delete)
-        self.assertNotEqual(after_create, after_clear)
+                                   text='Этот пост будет изменён')
+        urls = (reverse('posts:index'),
+                reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+                reverse('posts:profile',
+                        kwargs={'username': self.author.username}))
+        for url in urls:
+            with self.subTest(url=url):
+                cache.clear()
+                before = self.guest_client.get(url).content
+                Post.objects.filter(id=post.id).update(text=f'Изменён {url}')
+                after_update = self.guest_client.get(url).content
+                cache.clear()
+                after_clear = self.guest_client.get(url).content
+                self.assertEqual(before, after_update)
+                self.assertNotEqual(before, after_clear)
+
+    def test_cache_is_invalidated_by_post_changes(self):
+        """Кэш лент сбрасывается при создании и удалении поста"""
+        urls = (reverse('posts:index'),
+                reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+                reverse('posts:profile',
+                        kwargs={'username': self.author.username}))
+        for url in urls:
+            with self.subTest(url=url):
+                self.guest_client.get(url)
+                post = Post.objects.create(author=self.author,
+                                           group=self.group,
+                                           text='Новый пост в ленте')
+                response = self.guest_client.get(url)
+                self.assertIn(post, response.context['page_obj'])
+                post.delete()
+                response = self.guest_client.get(url)
+                self.assertNotContains(response, 'Новый пост в ленте')
+
+    def test_post_card_fragment_is_cached(self):
+        """Карточка поста берётся из кэша, пока пост не изменён"""
+        self.guest_client.get(reverse('posts:index'))
+        Post.objects.filter(id=self.post.id).update(text='Без сигналов')
+        bump_version(versions.INDEX)
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Тестовый текст поста')
+        post = Post.objects.get(id=self.post.id)
+        post.text = 'Изменённый текст'
+        post.save()
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Изменённый текст')
+        self.author.first_name = 'Лев'
+        self.author.save()
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Лев')
+
+    def test_group_slug_change_resets_cached_pages(self):
+        """Смена slug группы сбрасывает главную и старый адрес группы"""
+        group = Group.objects.create(title='Группа', slug='old-slug',
+                                     description='')
+        Post.objects.create(author=self.author, group=group, text='Пост')
+        old_url = reverse('posts:group_list', kwargs={'slug': 'old-slug'})
+        self.guest_client.get(reverse('posts:index'))
+        self.assertEqual(self.guest_client.get(old_url).status_code,
+                         HTTPStatus.OK)
+        group.slug = 'new-slug'
+        group.save()
+        self.assertEqual(self.guest_client.get(old_url).status_code,
+                         HTTPStatus.NOT_FOUND)
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, reverse(
+            'posts:group_list', kwargs={'slug': 'new-slug'}))
+        self.assertNotContains(response, old_url)
+
+    def test_group_delete_resets_cached_index(self):
+        """Удаление группы убирает ссылки на неё с главной"""
+        group = Group.objects.create(title='Группа', slug='doomed',
+                                     description='')
+        Post.objects.create(author=self.author, group=group, text='Пост')
+        url = reverse('posts:group_list', kwargs={'slug': 'doomed'})
+        self.assertContains(self.guest_client.get(reverse('posts:index')),
+                            url)
+        group.delete()
+        self.assertNotContains(
+            self.guest_client.get(reverse('posts:index')), url)
+
+    def test_author_rename_resets_group_pages(self):
+        """Новое имя автора видно на страницах групп с его постами"""
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        self.guest_client.get(url)
+        self.author.first_name = 'Ann'
+        self.author.last_name = 'B'
+        self.author.save()
+        self.assertContains(self.guest_client.get(url), 'Ann B')
+
+    def test_card_changes_reach_group_and_profile_pages(self):
+        """Сброс карточки поста виден в лентах группы и профиля"""
+        urls = (reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+                reverse('posts:profile',
+                        kwargs={'username': self.author.username}))
+        for url in urls:
+            with self.subTest(url=url):
+                self.guest_client.get(url)
+                text = f'Новая карточка {url}'
+                Post.objects.filter(id=self.post.id).update(text=text)
+                bump_posts([self.post.id])
+                self.assertContains(self.guest_client.get(url), text)
+
+    def test_group_card_changes_reach_profile_page(self):
+        """Новый slug группы виден в карточках профиля"""
+        url = reverse('posts:profile',
+                      kwargs={'username': self.author.username})
+        self.guest_client.get(url)
+        group = Group.objects.get(id=self.group.id)
+        group.slug = 'renamed-slug'
+        group.save()
+        self.assertContains(self.guest_client.get(url), reverse(
+            'posts:group_list', kwargs={'slug': 'renamed-slug'}))
+
+    def test_feed_answers_not_modified(self):
+        """Неизменившаяся лента отвечает 304 без запросов к базе"""
+        response = self.guest_client.get(reverse('posts:index'))
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(reverse('posts:index'),
+                                             HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        Post.objects.create(author=self.author, text='Новый пост')
+        response = self.guest_client.get(reverse('posts:index'),
+                                         HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_post_detail_answers_not_modified(self):
+        """Страница поста отвечает 304, пока не появился комментарий"""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        etag = self.guest_client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        Comment.objects.create(post=self.post, author=self.author,
+                               text='Новый комментарий')
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_missing_post_detail_is_not_found(self):
+        """Страница несуществующего поста отдаёт 404"""
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': 0}))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_post_detail_skips_comments_for_guests(self):
+        """Гостю комментарии не выводятся и не загружаются"""
+        Comment.objects.create(post=self.post, author=self.author,
+                               text='Комментарий')
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(url)
+        self.assertNotIn('comments', response.context)
+        # Комментарии читает только подзапрос валидаторов страницы
+        self.assertFalse(any('posts_comment' in query['sql']
+                             and 'last_comment' not in query['sql']
+                             for query in queries.captured_queries))
+        response = self.user_client.get(url)
+        self.assertContains(response, 'Комментарий')
+
+    def test_follow_index_shows_followed_authors_posts(self):
+        """Лента подписок показывает посты только избранных авторов"""
+        self.user_client.get(reverse('posts:profile_follow',
+                                     kwargs={'username':
+                                             self.author.username}))
+        self.assertTrue(Follow.objects.filter(user=self.user,
+                                              author=self.author).exists())
+        response = self.user_client.get(reverse('posts:follow_index'))
+        self.assertIn(self.post, response.context['page_obj'])
+        response = self.author_client.get(reverse('posts:follow_index'))
+        self.assertNotIn(self.post, response.context['page_obj'])
+        self.user_client.get(reverse('posts:profile_unfollow',
+                                     kwargs={'username':
+                                             self.author.username}))
+        response = self.user_client.get(reverse('posts:follow_index'))
+        self.assertNotIn(self.post, response.context['page_obj'])
+
+    def test_follow_index_query_count_does_not_grow(self):
+        """Число запросов ленты подписок не зависит от числа авторов"""
+        Follow.objects.create(user=self.user, author=self.author)
+        self.user_client.get(reverse('posts:follow_index'))
+        with CaptureQueriesContext(connection) as one_author:
+            self.user_client.get(reverse('posts:follow_index'))
+        authors = [User.objects.create_user(username=f'author_{num}')
+                   for num in range(5)]
+        Follow.objects.bulk_create(
+            Follow(user=self.user, author=author) for author in authors)
+        Post.objects.bulk_create(
+            Post(text='Пост', author=author) for author in authors)
+        timeline.rebuild(self.user)
+        with CaptureQueriesContext(connection) as many_authors:
+            response = self.user_client.get(reverse('posts:follow_index'))
+        self.assertEqual(len(response.context['page_obj']), 6)
+        self.assertEqual(len(one_author), len(many_authors))
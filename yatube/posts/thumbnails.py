@@ -0,0 +1,212 @@
+"""
+ Миниатюры картинок постов, которые строятся в фоне после загрузки.
+
+ Шаблоны только читают готовые миниатюры из хранилища sorl-thumbnail
+ и не декодируют картинки во время запроса.
+"""
+
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.helpers import ThumbnailError
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+
+from .invalidation import bump_posts
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# Размеры, в которых шаблоны выводят картинки постов
+THUMBNAILS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+
+# Ширины вариантов картинки карточки для srcset и подсказка браузеру,
+# какой ширины будет картинка на странице
+VARIANT_WIDTHS = (320, 640, 960)
+VARIANT_SIZES = '(max-width: 992px) 100vw, 960px'
+VARIANT_OPTIONS = {'crop': 'center', 'upscale': True}
+MIME_TYPES = {
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+}
+
+_executor = ThreadPoolExecutor(max_workers=settings.THUMBNAIL_WORKERS,
+                               thread_name_prefix='thumbnails')
+
+
+class PrebuiltThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl-thumbnail, умеющий искать миниатюру без её создания."""
+
+    def get_options(self, source, options):
+        """Дополняет options так же, как ThumbnailBackend.get_thumbnail."""
+        options = dict(options)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        return options
+
+    def thumbnail_file(self, file_, geometry_string, **options):
+        source = ImageFile(file_)
+        options = self.get_options(source, options)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def get_built_thumbnail(self, file_, geometry_string, **options):
+        """Возвращает готовую миниатюру или None, ничего не создавая."""
+        return default.kvstore.get(
+            self.thumbnail_file(file_, geometry_string, **options))
+
+
+backend = PrebuiltThumbnailBackend()
+
+
+def source_file(image):
+    """Картинка поста для sorl-thumbnail по FieldFile или имени файла.
+
+    Ключи миниатюр зависят от хранилища исходника, поэтому имени
+    нужно хранилище поля Post.image, а не хранилище по умолчанию.
+    """
+    if isinstance(image, str):
+        return ImageFile(image, Post._meta.get_field('image').storage)
+    return image
+
+
+def get_built_thumbnail(image, alias):
+    if not image:
+        return None
+    geometry, options = THUMBNAILS[alias]
+    return backend.get_built_thumbnail(source_file(image), geometry,
+                                       **options)
+
+
+def lookup_image_files(files):
+    """Ищет файлы в хранилище ключей sorl-thumbnail одним get_many.
+
+    files - словарь {ключ: ImageFile}, возвращается {ключ: ImageFile или
+    None}. Ключи, которых нет в кэше хранилища, читаются по одному
+    через default.kvstore, так что подходит любое хранилище ключей.
+    """
+    found = {}
+    kv_cache = getattr(default.kvstore, 'cache', None)
+    if kv_cache is not None and files:
+        found = kv_cache.get_many(
+            [add_prefix(file_.key, 'image') for file_ in files.values()])
+    image_files = {}
+    for key, file_ in files.items():
+        value = found.get(add_prefix(file_.key, 'image'))
+        if value is None:
+            image_files[key] = default.kvstore.get(file_)
+        elif value == EMPTY_VALUE:
+            image_files[key] = None
+        else:
+            try:
+                image_files[key] = deserialize_image_file(value)
+            except (ThumbnailError, ValueError):
+                image_files[key] = default.kvstore.get(file_)
+    return image_files
+
+
+def prefetch_thumbnails(posts, alias):
+    """Ищет готовые миниатюры картинок всех постов одним get_many.
+
+    Возвращает словарь {post.id: миниатюра или None}.
+    """
+    geometry, options = THUMBNAILS[alias]
+    return lookup_image_files(
+        {post.id: backend.thumbnail_file(post.image, geometry, **options)
+         for post in posts if post.image})
+
+
+def variant_height(width):
+    """Высота варианта с теми же пропорциями, что у карточки."""
+    return round(width * 339 / 960)
+
+
+def variant_geometry(width):
+    return f'{width}x{variant_height(width)}'
+
+
+def build_variants(image_name):
+    """Строит варианты картинки всех ширин и форматов.
+
+    Возвращает {mime-тип: [[имя файла, ширина], ...]} в порядке
+    settings.IMAGE_VARIANT_FORMATS.
+    """
+    source = source_file(image_name)
+    variants = {}
+    for format_ in settings.IMAGE_VARIANT_FORMATS:
+        variants[MIME_TYPES[format_]] = [
+            [backend.get_thumbnail(source, variant_geometry(width),
+                                   format=format_, **VARIANT_OPTIONS).name,
+             width]
+            for width in VARIANT_WIDTHS]
+    return variants
+
+
+def get_image_sources(post):
+    """Атрибуты <source> и <img> для записанных вариантов картинки.
+
+    Возвращает None, если варианты ещё не построены.
+    """
+    if not post.image or not post.image_variants:
+        return None
+    variants = json.loads(post.image_variants)
+    sources = [
+        {'type': mime_type,
+         'srcset': ', '.join(f'{default.storage.url(name)} {width}w'
+                             for name, width in files)}
+        for mime_type, files in variants.items()]
+    # Последний формат понимают все браузеры, он же идёт в src
+    fallback, width = variants[sources[-1]['type']][-1]
+    return {'sources': sources,
+            'src': default.storage.url(fallback),
+            'sizes': VARIANT_SIZES,
+            'width': width,
+            'height': variant_height(width)}
+
+
+def build_thumbnails(post_id, image_name):
+    """Строит миниатюры и варианты картинки и записывает их в пост.
+
+    После этого сбрасывает кэш карточки поста и лент, где она выводится.
+    """
+    for geometry, options in THUMBNAILS.values():
+        backend.get_thumbnail(source_file(image_name), geometry, **options)
+    variants = build_variants(image_name)
+    # Картинку могли заменить, пока строились варианты
+    Post.objects.filter(pk=post_id, image=image_name).update(
+        image_variants=json.dumps(variants))
+    bump_posts([post_id])
+
+
+def _build_in_background(post_id, image_name):
+    try:
+        build_thumbnails(post_id, image_name)
+    except Exception:
+        logger.exception('Не удалось построить миниатюры %s', image_name)
+    finally:
+        close_old_connections()
+
+
+def schedule_thumbnails(post):
+    """Ставит построение миниатюр в фон после фиксации транзакции."""
+    def submit():
+        if post.image:
+            _executor.submit(_build_in_background, post.id, post.image.name)
+    transaction.on_commit(submit)
@@ -0,0 +1,212 @@
+"""
+ Лента подписок с раскладкой постов по подписчикам при публикации.
+
+ Посты «звёзд» - авторов, у которых подписчиков стало больше
+ settings.TIMELINE_FANOUT_LIMIT, - по лентам не раскладываются
+ и читаются из таблицы постов при открытии ленты. Когда подписчиков
+ становится не больше settings.TIMELINE_FANOUT_LOW, старые посты
+ «звезды» раскладываются в фоне, а до конца раскладки всё ещё читаются
+ из таблицы постов.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Q
+
+from .models import AuthorStats, Follow, Post, Timeline
+from .utils import get_page_obj
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='timelines')
+
+
+def is_hot(author):
+    """Проверяет, не раскладываются ли посты автора по лентам."""
+    return AuthorStats.objects.filter(user=author, hot=True,
+                                      cooling=False).exists()
+
+
+def hot_authors(user):
+    """Возвращает id «звёзд», на которых подписан пользователь.
+
+    Сюда входят и бывшие «звёзды», чьи посты ещё раскладываются.
+    """
+    return list(Follow.objects.filter(
+        user=user, author__stats__hot=True).values_list('author', flat=True))
+
+
+def _bulk_insert(entries):
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, settings.TIMELINE_BATCH_SIZE))
+        if not batch:
+            return
+        Timeline.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_hot(post.author):
+        return
+    followers = Follow.objects.filter(
+        author=post.author_id).values_list('user', flat=True)
+    _bulk_insert(Timeline(user_id=user_id, post=post, pub_date=post.pub_date)
+                 for user_id in followers.iterator())
+
+
+def _insert_rows(rows):
+    """Вставляет строки (user, post, pub_date) из queryset rows в ленты
+    одним INSERT ... SELECT, не проходя через Python."""
+    sql, params = rows.query.sql_with_params()
+    ops = connection.ops
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'{ops.insert_statement(ignore_conflicts=True)} '
+            f'{Timeline._meta.db_table} (user_id, post_id, pub_date) {sql} '
+            f'{ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}',
+            params)
+
+
+def fan_out_many(posts):
+    """Раскладывает посты из queryset posts по лентам подписчиков авторов.
+
+    Нужна для постов, созданных без сигналов и представлений, например
+    при импорте.
+    """
+    _insert_rows(Follow.objects.filter(
+        author__posts__in=posts.values('pk')
+    ).exclude(
+        author__stats__hot=True, author__stats__cooling=False
+    ).values_list('user', 'author__posts__id', 'author__posts__pub_date'))
+
+
+def heat_up(author_id):
+    """Делает автора «звездой», если подписчиков стало больше предела.
+
+    Начатая раскладка его постов при этом прерывается.
+    """
+    AuthorStats.objects.filter(
+        user=author_id,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).exclude(hot=True, cooling=False).update(hot=True, cooling=False)
+
+
+def start_cool_down(author_id):
+    """Ставит в фон раскладку постов «звезды», у которой подписчиков
+    стало не больше settings.TIMELINE_FANOUT_LOW."""
+    started = AuthorStats.objects.filter(
+        user=author_id, hot=True, cooling=False,
+        followers_count__lte=settings.TIMELINE_FANOUT_LOW,
+    ).update(cooling=True)
+    if started:
+        transaction.on_commit(
+            lambda: _executor.submit(_cool_down_in_background, author_id))
+
+
+def cool_down(author_id):
+    """Раскладывает посты, написанные автором, пока он был «звездой».
+
+    Каждый шаг вставляет около settings.TIMELINE_COOL_DOWN_ROWS строк
+    лент в своей транзакции. Новые посты и подписки тем временем
+    раскладываются как обычно, а старые посты до конца раскладки
+    читаются из таблицы постов. Возвращает False, если раскладку
+    прервала новая подписка.
+    """
+    last_id = Post.objects.filter(author=author_id).order_by(
+        '-id').values_list('id', flat=True).first() or 0
+    start = 0
+    while True:
+        with transaction.atomic():
+            stats = AuthorStats.objects.select_for_update().filter(
+                user=author_id, cooling=True)
+            followers = stats.values_list('followers_count',
+                                          flat=True).first()
+            if followers is None:
+                return False
+            step = max(settings.TIMELINE_COOL_DOWN_ROWS // max(followers, 1),
+                       1)
+            post_ids = list(Post.objects.filter(
+                author=author_id, id__gt=start, id__lte=last_id,
+            ).order_by('id').values_list('id', flat=True)[:step])
+            if not post_ids:
+                stats.update(hot=False, cooling=False)
+                return True
+            _insert_rows(Follow.objects.filter(
+                author=author_id, author__posts__in=post_ids,
+            ).values_list('user', 'author__posts__id',
+                          'author__posts__pub_date'))
+        start = post_ids[-1]
+
+
+def _cool_down_in_background(author_id):
+    try:
+        cool_down(author_id)
+    except Exception:
+        logger.exception('Не удалось разложить посты автора %s', author_id)
+    finally:
+        close_old_connections()
+
+
+def finish_cool_downs():
+    """Доводит до конца раскладки, потерянные фоном или начатые из-за
+    смены пределов в настройках. Возвращает число авторов."""
+    AuthorStats.objects.filter(
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).exclude(hot=True, cooling=False).update(hot=True, cooling=False)
+    AuthorStats.objects.filter(
+        hot=True, cooling=False,
+        followers_count__lte=settings.TIMELINE_FANOUT_LOW,
+    ).update(cooling=True)
+    cooled = 0
+    for author_id in AuthorStats.objects.filter(cooling=True).values_list(
+            'user', flat=True):
+        cooled += cool_down(author_id)
+    return cooled
+
+
+def backfill(user, author):
+    """Добавляет в ленту пользователя посты автора после подписки."""
+    if is_hot(author):
+        return
+    posts = Post.objects.filter(author=author).values_list('id', 'pub_date')
+    _bulk_insert(Timeline(user=user, post_id=post_id, pub_date=pub_date)
+                 for post_id, pub_date in posts.iterator())
+
+
+def prune(user, author):
+    """Убирает из ленты пользователя посты автора после отписки."""
+    Timeline.objects.filter(user=user, post__author=author).delete()
+
+
+def rebuild(user):
+    """Заново раскладывает ленту пользователя по его подпискам."""
+    authors = Follow.objects.filter(user=user).exclude(
+        author__stats__hot=True, author__stats__cooling=False
+    ).values('author')
+    posts = Post.objects.filter(
+        author__in=authors).values_list('id', 'pub_date')
+    with transaction.atomic():
+        Timeline.objects.filter(user=user).delete()
+        _bulk_insert(Timeline(user=user, post_id=post_id, pub_date=pub_date)
+                     for post_id, pub_date in posts.iterator())
+
+
+def get_feed_page(request):
+    """Возвращает страницу постов ленты подписок пользователя."""
+    user = request.user
+    hot = hot_authors(user)
+    if hot:
+        entries = Timeline.objects.filter(user=user).values('post')
+        posts = Post.objects.select_related('author', 'group').filter(
+            Q(id__in=entries) | Q(author__in=hot))
+        return get_page_obj(request, posts)
+    entries = Timeline.objects.filter(user=user).select_related(
+        'post__author', 'post__group')
+    page_obj = get_page_obj(request, entries, tiebreaker='post_id')
+    page_obj.object_list = [entry.post for entry in page_obj.object_list]
+    return page_obj
@@ -6,18 +6,40 @@
 
 from django.urls import path
 
-from . import views
+from . import feeds, views
 
 app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('search/', views.post_search, name='search'),
+    path('rss/', feeds.posts_rss, name='posts_rss'),
+    path('atom/', feeds.posts_atom, name='posts_atom'),
     path('create/', views.post_create, name='post_create'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
+    path('group/<slug:slug>/rss/', feeds.group_rss, name='group_rss'),
+    path('group/<slug:slug>/atom/', feeds.group_atom, name='group_atom'),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path('profile/<str:username>/export/',
+         views.profile_export,
+         name='profile_export'),
+    path('profile/<str:username>/rss/', feeds.author_rss, name='author_rss'),
+    path('profile/<str:username>/atom/',
+         feeds.author_atom,
+         name='author_atom'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('posts/<int:post_id>/comment/',
          views.add_comment,
          name='add_comment'),
+    path('posts/<int:post_id>/comments/',
+         views.post_comments,
+         name='post_comments'),
+    path('follow/', views.follow_index, name='follow_index'),
+    path('profile/<str:username>/follow/',
+         views.profile_follow,
+         name='profile_follow'),
+    path('profile/<str:username>/unfollow/',
+         views.profile_unfollow,
+         name='profile_unfollow'),
 ]
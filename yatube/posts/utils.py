@@ -0,0 +1,80 @@
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+
+from core.cache import get_versions, page_validators
+from core.paginator import CursorPaginator, ElidedPaginator
+
+from . import versions
+from .models import Comment, Post
+from .thumbnails import prefetch_thumbnails
+
+
+def get_page_obj(request, queryset, tiebreaker='id'):
+    """Страница ленты по курсору или по номеру для старых ссылок ?page=."""
+    if 'page' in request.GET:
+        paginator = ElidedPaginator(queryset, settings.POST_PER_PAGE)
+        page_obj = paginator.get_page(request.GET.get('page'))
+        page_obj.elided_page_range = list(
+            paginator.get_elided_page_range(page_obj.number))
+        return page_obj
+    paginator = CursorPaginator(queryset, settings.POST_PER_PAGE,
+                                tiebreaker=tiebreaker)
+    return paginator.get_page(after=request.GET.get('after'),
+                              before=request.GET.get('before'))
+
+
+def attach_card_versions(page_obj):
+    """Добавляет постам страницы card_version - ключ кэша их карточек."""
+    scopes = {post.id: versions.post_card_scopes(post) for post in page_obj}
+    found = get_versions({scope for post_scopes in scopes.values()
+                          for scope in post_scopes})
+    for post in page_obj:
+        post.card_version = '.'.join(found[scope]
+                                     for scope in scopes[post.id])
+    return page_obj
+
+
+def attach_thumbnails(page_obj, alias='card'):
+    """Добавляет постам страницы prefetched_thumbnails для тега
+    post_thumbnail, чтобы не ходить в хранилище миниатюр за каждым."""
+    # Постам с вариантами картинки миниатюра не нужна
+    thumbnails = prefetch_thumbnails(
+        [post for post in page_obj if not post.image_variants], alias)
+    for post in page_obj:
+        post.prefetched_thumbnails = {alias: thumbnails.get(post.id)}
+    return page_obj
+
+
+def get_comments_page(request, comments):
+    """Страница комментариев от старых к новым вместе с их авторами."""
+    paginator = CursorPaginator(comments.select_related('author'),
+                                settings.COMMENTS_PER_PAGE,
+                                field='created',
+                                ascending=True)
+    return paginator.get_page(after=request.GET.get('after'))
+
+
+def post_validators(request, post_id, cookies=True):
+    """ETag и Last-Modified страницы поста одним запросом по индексам.
+
+    Страница зависит от версий поста, его автора и группы, а комментарии
+    отслеживаются по их числу и времени последнего.
+    """
+    last_comment = Comment.objects.filter(post=OuterRef('pk')).order_by(
+        '-created', '-id').values('created')[:1]
+    row = Post.objects.filter(pk=post_id).annotate(
+        last_comment=Subquery(last_comment)).values_list(
+        'author_id', 'author__username', 'group_id', 'comments_count',
+        'last_comment').first()
+    if row is None:
+        return None
+    author_id, username, group_id, comments_count, last_comment = row
+    scopes = [versions.post_scope(post_id),
+              versions.user_scope(author_id),
+              versions.profile_scope(username)]
+    if group_id is not None:
+        scopes.append(versions.group_card_scope(group_id))
+    found = get_versions(scopes)
+    modified = int(last_comment.timestamp()) if last_comment else None
+    return page_validators(request, [found[scope] for scope in scopes],
+                           modified, comments_count, cookies=cookies)
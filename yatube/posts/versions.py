@@ -0,0 +1,39 @@
+"""
+ Области версионированного кэша лент.
+"""
+
+INDEX = 'index'
+# Список всех групп, например варианты выбора группы в админке
+GROUPS = 'groups'
+
+
+def index_scope():
+    return INDEX
+
+
+def group_scope(slug):
+    return f'group:{slug}'
+
+
+def profile_scope(username):
+    return f'profile:{username}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def user_scope(user_id):
+    return f'user:{user_id}'
+
+
+def group_card_scope(group_id):
+    return f'group-card:{group_id}'
+
+
+def post_card_scopes(post):
+    """Области, от которых зависит карточка поста в ленте."""
+    scopes = [post_scope(post.id), user_scope(post.author_id)]
+    if post.group_id is not None:
+        scopes.append(group_card_scope(post.group_id))
+    return scopes
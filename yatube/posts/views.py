@@ -1,74 +1,122 @@
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse_lazy
-from django.views.decorators.cache import cache_page
 from django.views.generic.edit import CreateView
 
+from core.cache import cache_page_swr, conditional_page
+
+from . import export, search, timeline, versions
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from .images import check_image_uploads
+from .models import AuthorStats, Comment, Follow, Group, Post, User
+from .utils import (attach_card_versions, attach_thumbnails,
+                    get_comments_page, get_page_obj, post_validators)
 
 
-@cache_page(20, key_prefix='index_page')
+@cache_page_swr(settings.FEED_CACHE_TIMEOUT, 'index_page',
+                versions.index_scope)
 def index(request):
     posts = Post.objects.select_related('group', 'author').all()
-    paginator = Paginator(posts, settings.POST_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = attach_thumbnails(attach_card_versions(
+        get_page_obj(request, posts)))
     context = {'page_obj': page_obj}
     return render(request, 'posts/index.html', context)
 
 
+@cache_page_swr(settings.FEED_CACHE_TIMEOUT, 'group_page',
+                versions.group_scope)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     posts = group.posts.select_related(
         'group', 'author').all()
-    paginator = Paginator(posts, settings.POST_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
     context = {
         'group': group,
-        'page_obj': page_obj}
+        'page_obj': attach_thumbnails(attach_card_versions(
+            get_page_obj(request, posts)))}
     return render(request, 'posts/group_list.html', context)
 
 
+@cache_page_swr(settings.FEED_CACHE_TIMEOUT, 'profile_page',
+                versions.profile_scope)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.select_related('author').all()
+    author = get_object_or_404(User.objects.select_related('stats'),
+                               username=username)
+    posts = author.posts.select_related('group', 'author').all()
+    stats = AuthorStats.get_for(author)
     following = False
     if request.user.is_authenticated:
-        following = Follow.objects.filter(user=request.user.username,
-                                          author=username).exists()
-    paginator = Paginator(posts, settings.POST_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+        following = Follow.objects.filter(user=request.user,
+                                          author=author).exists()
     context = {
         'author': author,
-        'posts_count': posts.count(),
+        'posts_count': stats.posts_count,
+        'followers_count': stats.followers_count,
+        'following_count': stats.following_count,
         'following': following,
-        'page_obj': page_obj}
+        'page_obj': attach_thumbnails(attach_card_versions(
+            get_page_obj(request, posts)))}
     return render(request, 'posts/profile.html', context)
 
 
+@login_required
+def profile_export(request, username):
+    # Архив своих постов, комментариев и картинок
+    if request.user.username != username:
+        return redirect('posts:profile', username)
+    response = StreamingHttpResponse(export.author_archive(request.user),
+                                     content_type='application/zip')
+    response['Content-Disposition'] = (
+        f'attachment; filename="{username}-yatube.zip"')
+    response['Cache-Control'] = 'private, no-store'
+    return response
+
+
+def post_search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = search.search_page(query, settings.POST_PER_PAGE,
+                                  after=request.GET.get('after'))
+    context = {
+        'query': query,
+        'page_obj': attach_thumbnails(attach_card_versions(page_obj))}
+    return render(request, 'posts/search.html', context)
+
+
+@conditional_page(post_validators)
 def post_detail(request, post_id):
-    post = Post.objects.select_related('group', 'author').get(id=post_id)
-    posts_count = post.author.posts.count()
-    form = CommentForm(request.POST or None)
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.select_related('group', 'author__stats'), id=post_id)
+    posts_count = AuthorStats.get_for(post.author).posts_count
     context = {'post': post,
-               'posts_count': posts_count,
-               'form': form,
-               'comments': comments}
+               'posts_count': posts_count}
+    # Комментарии и форма выводятся только вошедшим пользователям
+    if request.user.is_authenticated:
+        context['form'] = CommentForm(request.POST or None)
+        context['comments'] = get_comments_page(request,
+                                                post.comments.all())
     return render(request, 'posts/post_detail.html', context)
 
 
+@login_required
+def post_comments(request, post_id):
+    # Следующая пачка комментариев для кнопки «Показать ещё»;
+    # как и на странице поста, комментарии видны только после входа
+    post = get_object_or_404(Post, pk=post_id)
+    comments = Comment.objects.filter(post=post)
+    context = {'post_id': post.id,
+               'comments': get_comments_page(request, comments)}
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
 class PostView(CreateView):
     form_class = PostForm
     template_name = 'posts/create_post.html'
     success_url = reverse_lazy('about:author')
 
 
+@check_image_uploads
 def post_create(request):
     if not request.user.is_authenticated:
         return redirect('users:login')
@@ -80,13 +128,16 @@ def post_create(request):
         'form': form
     }
     if request.method == 'POST' and form.is_valid():
-        post = form.save(commit=False)
-        post.author = request.user
-        post.save()
+        with transaction.atomic():
+            post = form.save(commit=False)
+            post.author = request.user
+            post.save()
+            timeline.fan_out(post)
         return redirect('posts:profile', post.author)
     return render(request, 'posts/create_post.html', context)
 
 
+@check_image_uploads
 def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = PostForm(request.POST or None,
@@ -113,21 +164,15 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
 def follow_index(request):
-    if not request.user.is_authenticated:
-        return redirect('users:login')
-    following = Follow.author.filter(user=request.user.username)
-    posts = []
-    for author in following:
-        posts += author.posts.select_related('author').all()
-    paginator = Paginator(posts, settings.POST_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = attach_thumbnails(attach_card_versions(
+        timeline.get_feed_page(request)))
     context = {'page_obj': page_obj}
     return render(request, 'posts/follow.html', context)
 
@@ -135,14 +180,21 @@ def follow_index(request):
 @login_required
 def profile_follow(request, username):
     # Подписаться на автора
-    if not request.user.is_authenticated:
-        return redirect('users:login')
-    Follow.objects.create(user=request.user.username,
-                          author=username)
+    author = get_object_or_404(User, username=username)
+    if author != request.user:
+        with transaction.atomic():
+            _, created = Follow.objects.get_or_create(user=request.user,
+                                                      author=author)
+            if created:
+                timeline.backfill(request.user, author)
+    return redirect('posts:profile', username)
 
 
 @login_required
 def profile_unfollow(request, username):
     # Дизлайк, отписка
-    Follow.objects.filter(user=request.user.username,
-                          author=username).delete()
+    author = get_object_or_404(User, username=username)
+    with transaction.atomic():
+        Follow.objects.filter(user=request.user, author=author).delete()
+        timeline.prune(request.user, author)
+    return redirect('posts:profile', username)
@@ -47,6 +47,7 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
 ]
 
@@ -154,6 +155,41 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 # User variables
 POST_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+# Сколько записей по умолчанию и самое большее отдаёт JSON API
+# и сколько секунд клиенты могут не перепроверять его ответы
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+API_CACHE_MAX_AGE = 60
+# Сколько последних постов попадает в RSS и Atom
+SYNDICATION_ITEMS = 20
+# Страницы лент кэшируются надолго: сигналы Post сбрасывают их версии
+FEED_CACHE_TIMEOUT = 60 * 60 * 6
+# Сколько ещё отдавать устаревшую страницу, пока один процесс её обновляет
+CACHE_STALE_TIMEOUT = 60 * 60
+CACHE_LOCK_TIMEOUT = 30
+CACHE_LOCK_WAIT = 2
+# Сколько потоков строят миниатюры картинок в фоне
+THUMBNAIL_WORKERS = 2
+# Форматы вариантов картинки для srcset: первым идёт самый предпочтительный,
+# последний должен поддерживаться всеми браузерами
+IMAGE_VARIANT_FORMATS = ('WEBP', 'JPEG')
+# Ограничения загружаемых картинок: размер файла, число пикселей
+# и сторона, до которой уменьшаются слишком большие оригиналы
+IMAGE_MAX_UPLOAD_SIZE = 20 * 1024 * 1024
+IMAGE_MAX_PIXELS = 40_000_000
+IMAGE_MAX_SIDE = 2560
+# Посты авторов, у которых подписчиков больше этого числа, не раскладываются
+# по лентам подписчиков при публикации, а читаются при открытии ленты
+TIMELINE_FANOUT_LIMIT = 5000
+# Посты «звезды» раскладываются по лентам снова, только когда подписчиков
+# становится не больше этого числа, чтобы подписки и отписки на границе
+# не запускали раскладку раз за разом
+TIMELINE_FANOUT_LOW = 4000
+TIMELINE_BATCH_SIZE = 500
+# Сколько строк лент вставляет один шаг фоновой раскладки постов бывшей
+# «звезды»; каждый шаг идёт в своей транзакции
+TIMELINE_COOL_DOWN_ROWS = 50_000
 
 CACHES = {
     'default': {